@@ -1,52 +1,217 @@
 import pygame
 import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
 
-class AudioPlayer:
+from crossfade import CrossfadeEngine, CROSSFADE_MAX, HANDOFF_FADE_MS
+
+# How many previously played songs "Previous" can go back through
+HISTORY_LIMIT = 500
+# Gapless mode hands the next song to pygame this many seconds before the current one ends
+PRELOAD_SECONDS = 10
+# pygame posts this when a song ends (or the one queued in pygame takes over)
+MUSIC_END = pygame.USEREVENT + 1
+
+class SongQueue:
+    """
+    List-backed queue with a moving head index. popleft(), appendleft() and
+    skipping ahead are O(1) (amortized) no matter how long the queue is;
+    everything else behaves like a normal list of songs.
+    """
+    def __init__(self, songs=()):
+        self._items = list(songs)
+        self._head = 0
+
+    def __len__(self): return len(self._items) - self._head
+    def __iter__(self): return islice(self._items, self._head, None)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[self._head + i] for i in range(len(self))[index]]
+        return self._items[self._head + range(len(self))[index]]
+
+    def __setitem__(self, index, song):
+        self._items[self._head + range(len(self))[index]] = song
+
+    def append(self, song): self._items.append(song)
+    def extend(self, songs): self._items.extend(songs)
+    def to_list(self): return self._items[self._head:]
+
+    def popleft(self):
+        if not len(self): raise IndexError("pop from an empty queue")
+        song = self._items[self._head]
+        self._items[self._head] = None # Let the song be freed
+        self._head += 1
+        self._compact()
+        return song
+
+    def appendleft(self, song):
+        if self._head == 0:
+            # Reserve free slots in front so the next few appendlefts are O(1)
+            spare = max(16, len(self))
+            self._items[0:0] = [None] * spare
+            self._head = spare
+        self._head -= 1
+        self._items[self._head] = song
+
+    def skip(self, count, keep=None):
+        """
+        Drops the first count songs in one step and returns them
+        (only the last `keep` of them if given, e.g. for a bounded history).
+        """
+        count = max(0, min(count, len(self)))
+        start = self._head if keep is None else max(self._head, self._head + count - keep)
+        skipped = self._items[start:self._head + count]
+        self._head += count
+        self._compact()
+        return skipped
+
+    def insert_many(self, index, songs):
+        index = max(0, min(index, len(self)))
+        self._items[self._head + index:self._head + index] = list(songs)
+
+    def shuffle(self):
+        items = self.to_list()
+        random.shuffle(items)
+        self._items, self._head = items, 0
+
+    def clear(self):
+        self._items, self._head = [], 0
+
+    def _compact(self):
+        # Only copy once the dead prefix is bigger than the live part (amortized O(1))
+        if self._head > 1024 and self._head * 2 > len(self._items):
+            self._items = self._items[self._head:]
+            self._head = 0
+
+class PlaybackClock:
+    """
+    Position in the current song from time.monotonic(), set when a song starts or is
+    sought and held while paused. Unlike get_pos() (time since play(), whatever the
+    start position was) it doesn't drift after seeks.
+    """
     def __init__(self):
+        self.zero = None   # monotonic() at position 0 while running, None while held
+        self.held = 0.0    # The position while held
+
+    def set(self, seconds):
+        self.zero = time.monotonic() - seconds
+
+    def hold(self, seconds=None):
+        self.held = self.position() if seconds is None else seconds
+        self.zero = None
+
+    def resume(self):
+        if self.zero is None: self.set(self.held)
+
+    def position(self):
+        return self.held if self.zero is None else time.monotonic() - self.zero
+
+class AudioPlayer:
+    """
+    Plays the queue through pygame.mixer.music. In gapless mode (the default) the next
+    song is handed to pygame.mixer.music.queue() shortly before the current one ends, so
+    pygame starts it the moment the first one finishes, with no gap for our polling.
+    pygame reports the hand-off and every end of a song with a MUSIC_END event; pump_events()
+    (called by the GUI while something plays) handles them, moving current_song, history and
+    the queue along as if the song had been started here. The position comes from a PlaybackClock.
+    With set_crossfade(seconds) songs overlap instead (see CrossfadeEngine): the next song's
+    start plays on its own channel during the fade, then goes on streaming like any other.
+    """
+    def __init__(self, history_limit=HISTORY_LIMIT, gapless=True, crossfade=0):
         try:
             pygame.mixer.init(frequency=44100) 
         except Exception as e:
             print(f"Error initializing Pygame mixer: {e}")
+        try:
+            # pygame only delivers events with its video system up (no window is opened)
+            pygame.display.init()
+            pygame.mixer.music.set_endevent(MUSIC_END)
+            self.events = True
+        except Exception as e:
+            print(f"No music end events, polling instead: {e}")
+            self.events = False
             
-        self.queue = []
-        self.history = []
+        self.queue = SongQueue()
+        # Ring buffer: the oldest entries fall off once history_limit is reached
+        self.history = deque(maxlen=history_limit)
         self.current_song = None
         self.is_playing = False 
         self.is_paused = False
-        self.current_pos_offset = 0.0 
+        self.clock = PlaybackClock()
+        self.gapless = gapless
+        self.preloaded = None     # The song queued in pygame (still first in self.queue until it starts)
+        self.crossfade = CrossfadeEngine()
+        self.crossfade.seconds = crossfade
+        self._batch_depth = 0
+        self._queue_dirty = False
         
         # Callbacks
         self.on_song_changed = None 
         self.on_queue_changed = None
         self.on_playback_state_changed = None
 
+    # --- QUEUE NOTIFICATIONS ---
+    def _queue_changed(self):
+        # Inside a batch we only remember that something changed
+        if self._batch_depth: self._queue_dirty = True
+        else:
+            self._next_song_changed()
+            if self.on_queue_changed: self.on_queue_changed(self.queue)
+
+    @contextmanager
+    def batch_queue_changes(self):
+        """Groups several queue edits so on_queue_changed fires once at the end."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._queue_dirty:
+                self._queue_dirty = False
+                self._next_song_changed()
+                if self.on_queue_changed: self.on_queue_changed(self.queue)
+
     def play_now(self, song):
-        self.stop()
-        self.queue = []
-        self.queue.append(song)
-        self.play_next_from_queue()
-        if self.on_queue_changed: self.on_queue_changed(self.queue)
+        self.play_list([song])
 
     def play_list(self, songs, start_index=0):
-        self.stop()
-        self.queue = list(songs)
-        if self.queue:
+        with self.batch_queue_changes():
+            self.stop()
+            self.replace_queue(list(songs)[start_index:])
             self.play_next_from_queue()
-        if self.on_queue_changed: self.on_queue_changed(self.queue)
 
     def add_to_queue(self, song):
-        self.queue.append(song)
-        if self.on_queue_changed: self.on_queue_changed(self.queue)
-        if not self.is_playing and not self.is_paused:
-            self.play_next_from_queue()
+        self.add_many_to_queue([song])
+
+    def add_many_to_queue(self, songs):
+        """Appends all songs with a single queue-changed notification."""
+        with self.batch_queue_changes():
+            self.queue.extend(songs)
+            self._queue_changed()
+            if not self.is_playing and not self.is_paused:
+                self.play_next_from_queue()
+
+    def replace_queue(self, songs):
+        """Swaps the whole Up Next list without touching the current song."""
+        with self.batch_queue_changes():
+            self.queue = SongQueue(songs)
+            self._queue_changed()
+
+    def insert_into_queue(self, index, songs):
+        """Inserts songs before queue position index (0 = play next)."""
+        with self.batch_queue_changes():
+            self.queue.insert_many(index, songs)
+            self._queue_changed()
 
     def clear_queue(self):
-        self.queue = []
-        if self.on_queue_changed: self.on_queue_changed(self.queue)
+        self.replace_queue([])
 
     def shuffle_queue(self):
-        random.shuffle(self.queue)
-        if self.on_queue_changed: self.on_queue_changed(self.queue)
+        self.queue.shuffle()
+        self._queue_changed()
 
     def skip_to_index(self, index):
         """Skips directly to the song at the specified queue index."""
@@ -56,48 +221,161 @@ class AudioPlayer:
             if self.current_song:
                 self.history.append(self.current_song)
             
-            # Remove songs before the selected index and add to history
-            for _ in range(index):
-                skipped = self.queue.pop(0)
-                self.history.append(skipped)
+            # Move the songs before the selected index to history in one step
+            # (only as many as the history can hold are copied)
+            self.history.extend(self.queue.skip(index, keep=self.history.maxlen))
                 
             # Play the selected song (which is now at index 0)
+            with self.batch_queue_changes():
+                self.play_next_from_queue()
+                self._queue_changed()
+
+    # --- GAPLESS ---
+    def _preload_next(self):
+        """Queues the next song in pygame once the current one is about to end."""
+        if not self.gapless or not self.events or self.preloaded is not None or not len(self.queue) or not self.current_song: return
+        duration = self.current_song.duration or 0
+        if duration > 0 and self.crossfade.will_fade(self.queue[0]): return # Crossfades instead
+        if duration > 0 and duration - self.get_current_position() > PRELOAD_SECONDS: return
+        self._queue_in_pygame(self.queue[0])
+
+    def _queue_in_pygame(self, song):
+        try:
+            pygame.mixer.music.queue(song.filepath)
+            self.preloaded = song
+        except Exception as e:
+            print(f"Error preloading file: {e}") # It gets another try when it's its turn
+            self.preloaded = None
+
+    def _next_song_changed(self):
+        # The queue changed after the next song went to pygame: queue the new next song instead.
+        # pygame can't take a queued song back, so if the queue is empty now _hand_off() stops it
+        if self.preloaded is not None and len(self.queue) and self.queue[0] is not self.preloaded:
+            self._queue_in_pygame(self.queue[0])
+        # Crossfading: get the next song's start decoded (after a running fade, one at a time)
+        if self.current_song and len(self.queue) and not self.crossfade.fading: self.crossfade.prepare(self.queue[0])
+
+    def _hand_off(self):
+        """pygame has just started the preloaded song by itself: catch up with it."""
+        song, self.preloaded = self.preloaded, None
+        if self.current_song: self.history.append(self.current_song)
+        self.current_song = None
+        if not len(self.queue) or self.queue[0] is not song:
+            # The queue changed too late, that song shouldn't play
+            self.stop()
+            if self.on_song_changed: self.on_song_changed(None)
             self.play_next_from_queue()
-            
-            # Update UI
-            if self.on_queue_changed: self.on_queue_changed(self.queue)
+            return
+        self.queue.popleft()
+        self.current_song = song
+        self.clock.set(max(0, pygame.mixer.music.get_pos()) / 1000) # get_pos() started over with the song
+        song.play()
+        if self.on_song_changed: self.on_song_changed(song)
+        self._queue_changed()
 
-    def check_music_status(self):
-        if self.is_playing and not self.is_paused:
-            if not pygame.mixer.music.get_busy():
-                print("Song finished naturally.")
-                self.is_playing = False
-                self.is_paused = False
-                if self.current_song:
-                    self.history.append(self.current_song)
-                self.current_song = None
-                
-                if self.on_song_changed: self.on_song_changed(None)
-                self.play_next_from_queue()
+    # --- CROSSFADE ---
+    def set_crossfade(self, seconds):
+        """Overlaps songs by seconds (0 to CROSSFADE_MAX), 0 turns crossfades off."""
+        self.crossfade.seconds = max(0, min(CROSSFADE_MAX, seconds))
+        if not self.crossfade.seconds and not self.crossfade.fading: self.crossfade.cancel()
+        else: self._next_song_changed()
+
+    def _crossfade_remaining(self):
+        """Seconds left of the current song if it's time to start the crossfade, else None."""
+        seconds = self.crossfade.seconds
+        if not seconds or self.preloaded is not None or not len(self.queue) or not self.crossfade.ready(self.queue[0]): return None
+        duration = self.current_song.duration if self.current_song else 0
+        remaining = (duration or 0) - self.get_current_position()
+        return remaining if 0.5 < remaining <= seconds else None
+
+    def _start_crossfade(self, remaining):
+        song = self.queue.popleft()
+        self.crossfade.start(remaining)
+        pygame.mixer.music.fadeout(int(remaining * 1000))
+        if self.current_song: self.history.append(self.current_song)
+        self.current_song = song
+        self.clock.set(0)
+        song.play()
+        if self.on_song_changed: self.on_song_changed(song)
+        self._queue_changed()
+
+    def _take_over_stream(self):
+        """The fade is over: the new song goes on streaming from where its channel got to."""
+        pos = self.crossfade.position()
+        try:
+            pygame.mixer.music.load(self.current_song.filepath)
+            pygame.mixer.music.play(start=pos, fade_ms=HANDOFF_FADE_MS)
+            self._drop_end_events() # The faded out song's
+            self.clock.set(pos)
+        except Exception as e:
+            print(f"Error playing file: {e}") # Nothing streams, the next check moves on
+        self.crossfade.finish()
+        self._next_song_changed()
+
+    def shutdown(self):
+        self.crossfade.shutdown()
+
+    # --- EVENT PUMP ---
+    def _music_ended(self):
+        """True when pygame finished a song (or started the one queued in it) since the last call."""
+        if not self.events: return not pygame.mixer.music.get_busy()
+        # Everything is taken off SDL's queue, other events would only pile up there
+        return any(event.type == MUSIC_END for event in pygame.event.get())
+
+    def _drop_end_events(self):
+        # stop() and fadeouts post MUSIC_END too, it must not pass for the end of what plays next
+        if self.events: pygame.event.clear(MUSIC_END)
+
+    def pump_events(self):
+        """
+        Handles the end of songs and whatever is due on the clock (preloading, crossfades).
+        The GUI calls this every few milliseconds while something plays; it's cheap.
+        """
+        ended = self._music_ended()
+        if not self.is_playing or self.is_paused: return
+        if self.crossfade.fading:
+            # The old song's fadeout ends in here, the new one is on the channel until the stream takes over
+            if self.crossfade.position() >= self.crossfade.length: self._take_over_stream()
+            return
+        if ended and self.preloaded is not None and pygame.mixer.music.get_busy():
+            self._hand_off()
+        elif ended and not pygame.mixer.music.get_busy():
+            print("Song finished naturally.")
+            self.preloaded = None
+            self.is_playing = False
+            self.is_paused = False
+            self.clock.hold(0)
+            if self.current_song:
+                self.history.append(self.current_song)
+            self.current_song = None
+
+            if self.on_song_changed: self.on_song_changed(None)
+            self.play_next_from_queue()
+        else:
+            remaining = self._crossfade_remaining()
+            if remaining is not None: self._start_crossfade(remaining)
+            else: self._preload_next()
 
     def play_next_from_queue(self):
         if self.is_playing: return
         if len(self.queue) == 0: return
 
-        song = self.queue.pop(0)
+        song = self.queue.popleft()
         self.current_song = song
         
         try:
+            self.preloaded = None # load() empties pygame's queue
             pygame.mixer.music.load(song.filepath)
-            self.current_pos_offset = 0.0
             pygame.mixer.music.play()
+            self.clock.set(0)
             song.play()
             self.is_playing = True
             self.is_paused = False
             
             if self.on_song_changed: self.on_song_changed(self.current_song)
-            if self.on_queue_changed: self.on_queue_changed(self.queue)
+            self._queue_changed()
             if self.on_playback_state_changed: self.on_playback_state_changed(True)
+            self._preload_next()
         except Exception as e:
             print(f"Error playing file: {e}")
             self.is_playing = False
@@ -105,22 +383,28 @@ class AudioPlayer:
 
     def toggle_playback(self):
         if not self.current_song: return
+        if self.crossfade.fading: self._take_over_stream()
         if self.is_paused:
             pygame.mixer.music.unpause()
+            self.clock.resume()
             self.is_paused = False
             self.is_playing = True
             if self.on_playback_state_changed: self.on_playback_state_changed(True)
         elif self.is_playing:
             pygame.mixer.music.pause()
+            self.clock.hold()
             self.is_paused = True
             self.is_playing = False
             if self.on_playback_state_changed: self.on_playback_state_changed(False)
 
     def seek(self, seconds):
         if self.current_song:
+            if self.crossfade.fading: self._take_over_stream()
             try:
-                pygame.mixer.music.play(start=seconds)
-                self.current_pos_offset = seconds
+                # pygame seeks WAVs to the whole second, the clock has to start where the song really does
+                if self.current_song.filepath.lower().endswith(".wav"): seconds = int(seconds)
+                pygame.mixer.music.play(start=seconds) # Keeps pygame's queue
+                self.clock.set(seconds)
                 self.is_playing = True
                 self.is_paused = False
                 if self.on_playback_state_changed: self.on_playback_state_changed(True)
@@ -129,12 +413,7 @@ class AudioPlayer:
 
     def get_current_position(self):
         if not self.current_song: return 0
-        try:
-            pygame_pos_seconds = pygame.mixer.music.get_pos() / 1000.0
-            if pygame_pos_seconds < 0: return self.current_pos_offset
-            return self.current_pos_offset + pygame_pos_seconds
-        except:
-            return 0
+        return self.clock.position()
 
     def skip_to_next(self):
         self.stop()
@@ -148,15 +427,18 @@ class AudioPlayer:
         else:
             if len(self.history) == 0: return
             self.stop()
-            if self.current_song: self.queue.insert(0, self.current_song)
+            if self.current_song: self.queue.appendleft(self.current_song)
             self.current_song = None
             prev_song = self.history.pop()
-            self.queue.insert(0, prev_song)
+            self.queue.appendleft(prev_song)
             self.play_next_from_queue()
 
     def stop(self):
-        pygame.mixer.music.stop()
+        pygame.mixer.music.stop() # Also empties pygame's queue
+        self._drop_end_events()
+        self.preloaded = None
+        self.crossfade.cancel()
         self.is_playing = False
         self.is_paused = False
-        self.current_pos_offset = 0.0
+        self.clock.hold(0)
         if self.on_playback_state_changed: self.on_playback_state_changed(False)
\ No newline at end of file
@@ -0,0 +1,398 @@
+"""
+Small benchmarks for the slow paths we've optimized.
+Run all of them with `python benchmarks.py`, or pick some: `python benchmarks.py queue`
+"""
+import gc
+import sys
+import time
+
+def _best_of(fn, setup=None, repeat=5):
+    # Best of a few runs, in seconds. setup() runs outside the timer, its result goes to fn
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# --- QUEUE ---
+def bench_queue():
+    from audio_player import SongQueue, HISTORY_LIMIT
+
+    print("Queue: next (1000 pops) and skip to the middle, old list vs SongQueue")
+    for n in (1_000, 10_000, 100_000):
+        songs = list(range(n))
+        new_list = lambda: list(songs)
+        new_queue = lambda: SongQueue(songs)
+
+        def list_next(q):
+            for _ in range(1000): q.pop(0)
+        def queue_next(q):
+            for _ in range(1000): q.popleft()
+        def list_skip(q):
+            history = []
+            for _ in range(n // 2): history.append(q.pop(0))
+        def queue_skip(q):
+            q.skip(n // 2, keep=HISTORY_LIMIT)
+
+        print(f"  n={n:>7}: next list {_best_of(list_next, new_list) * 1e3:8.3f} ms"
+              f" | SongQueue {_best_of(queue_next, new_queue) * 1e3:6.3f} ms"
+              f"   skip list {_best_of(list_skip, new_list, repeat=1) * 1e3:9.3f} ms"
+              f" | SongQueue {_best_of(queue_skip, new_queue) * 1e3:6.3f} ms")
+
+# --- SEARCH ---
+def make_synthetic_rows(n, seed=1, album_size=1):
+    """
+    n fake songs.txt rows (add_song arguments) with a realistic-ish spread of
+    artists, albums and repeated words. Titles are unique, like the library requires.
+    album_size > 1 groups consecutive rows into albums (same artist, album, folder and cover).
+    """
+    import random
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ra", "te", "su", "vin", "dor", "el", "an", "bri", "zu", "pho", "gal", "ner", "ost"]
+    word = lambda: "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+    vocab = [word() for _ in range(20_000)]
+    phrase = lambda lo, hi: " ".join(rng.choice(vocab) for _ in range(rng.randint(lo, hi))).title()
+    artists = [phrase(1, 3) for _ in range(max(10, n // 50))]
+    genres = ["Rock", "Pop", "Jazz", "Hardcore", "Hip Hop", "Classical", "Electronic", "Folk", "Metal", "Soul"]
+    rows, titles = [], set()
+    for i in range(n):
+        if i % album_size == 0: artist, album = rng.choice(artists), phrase(1, 3)
+        title = phrase(1, 5)
+        if title.lower() in titles: title = f"{title} {i}"
+        titles.add(title.lower())
+        rows.append((title, artist, album, i % album_size + 1 if album_size > 1 else rng.randint(1, 14), rng.randint(60, 600), rng.choice(genres),
+                     f"C:/Users/someone/Music/{artist}/{album}/{title}.mp3", f"C:/Users/someone/Music/{artist}/{album}/cover.jpg",
+                     rng.random() < 0.1, rng.randint(0, 200)))
+    return rows
+
+def make_synthetic_library(n):
+    from music_library import MusicLibrary
+    library = MusicLibrary()
+    library.add_songs(make_synthetic_rows(n))
+    # Like the app does once its library has loaded (gui_main's finish_loading). Each benchmark
+    # library gets its own freeze here, the app only ever has one
+    gc.collect()
+    gc.freeze()
+    return library
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def _sample_queries(songs, count=200, seed=2):
+    """Real words, word prefixes, substrings, two-word queries and genres from the library."""
+    import random
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        s = rng.choice(songs)
+        w = rng.choice(s.title.split()).lower()
+        queries.append(rng.choice([w, w[:4], w[1:5], f"{w} {s.artist.split()[0][:3]}", s.genre]))
+    return queries
+
+def _time_queries(fn, queries):
+    fn(queries[0]) # Warm up (builds lazy structures)
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - start)
+    return f"p50 {_percentile(times, 50) * 1e3:6.2f} ms  p99 {_percentile(times, 99) * 1e3:7.2f} ms"
+
+def bench_search():
+    for n in (100_000, 1_000_000):
+        start = time.perf_counter()
+        library = make_synthetic_library(n)
+        build = time.perf_counter() - start
+        queries = _sample_queries(list(library.all_songs.values()))
+        library.search("rock", limit=200) # First broad query sorts the buffered play count index
+        print(f"Search n={n:>9}: library + index build {build:6.1f} s | query (top 200) "
+              f"{_time_queries(lambda q: library.search(q, limit=200), queries)}")
+
+# --- FUZZY SEARCH ---
+def _typo(word, rng):
+    """word with one random typo: a wrong, missing, extra or swapped letter."""
+    i = rng.randrange(len(word))
+    kind = rng.choice(["replace", "delete", "insert", "swap"])
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if kind == "replace": return word[:i] + letter + word[i + 1:]
+    if kind == "delete": return word[:i] + word[i + 1:]
+    if kind == "insert": return word[:i] + letter + word[i:]
+    i = min(i, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+def _sample_typo_queries(songs, count=200, seed=3):
+    """Misspelled artist words (two typos in long ones) and misspelled artist + title queries."""
+    import random
+    from search import typo_budget
+    rng = random.Random(seed)
+    misspell = lambda w: _typo(_typo(w, rng), rng) if typo_budget(w) == 2 else _typo(w, rng)
+    queries = []
+    for _ in range(count):
+        s = rng.choice(songs)
+        artist = max(s.artist.split(), key=len).lower()
+        title = max(s.title.split(), key=len).lower()
+        queries.append(rng.choice([misspell(artist), f"{misspell(artist)} {misspell(title)}"]))
+    return queries
+
+def bench_fuzzy():
+    for n in (100_000, 1_000_000):
+        library = make_synthetic_library(n)
+        queries = _sample_typo_queries(list(library.all_songs.values()))
+        library.search("rock", limit=200)
+        found = sum(1 for q in queries if library.search(q, limit=1, fuzzy=True))
+        print(f"Fuzzy search n={n:>9}: {found}/{len(queries)} misspelled queries found | query (top 200) "
+              f"{_time_queries(lambda q: library.search(q, limit=200, fuzzy=True), queries)}")
+
+# --- MEMORY ---
+class _DictSong:
+    """Song as it was before: a __dict__ per track and its own copy of every string."""
+    def __init__(self, title, artist, album, track_number, duration, genre, filepath, image_path, is_liked=False, play_count=0):
+        self.title = title
+        self.duration = duration
+        self.artist = artist
+        self.album = album
+        self.track_number = track_number
+        self.genre = genre
+        self.filepath = filepath
+        self.image_path = image_path
+        self.is_liked = is_liked
+        self.play_count = play_count
+        self.library = None
+
+def _parse_line(line):
+    # Like load_songs_from_file: every field of every line starts as its own string
+    p = line.split("|")
+    return p[0], p[1], p[2], int(p[3]), int(p[4]), p[5], p[6], p[7], p[8] == "True", int(p[9])
+
+def _traced_bytes(build):
+    """(result, bytes still allocated by build() once it returns)."""
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, used
+
+def bench_memory():
+    from music_library import MusicLibrary, Song
+    mb = lambda b: f"{b / 2**20:7.1f} MB"
+    for n in (100_000, 1_000_000):
+        lines = ["|".join(map(str, row)) for row in make_synthetic_rows(n, album_size=10)]
+        old, old_bytes = _traced_bytes(lambda: [_DictSong(*_parse_line(l)) for l in lines])
+        del old
+        new, new_bytes = _traced_bytes(lambda: [Song(*_parse_line(l)) for l in lines])
+        del new
+        print(f"Memory n={n:>9}: songs, old layout {mb(old_bytes)} | slotted + shared strings {mb(new_bytes)} "
+              f"({new_bytes / old_bytes:.0%}, {(old_bytes - new_bytes) / n:.0f} bytes saved per song)")
+    # Everything the library keeps per song on top of the records (sort, group and search indexes)
+    def build_library():
+        library = MusicLibrary()
+        for l in lines[:100_000]: library.add_song(*_parse_line(l))
+        library.get_sorted_song_list()
+        return library
+    library, total = _traced_bytes(build_library)
+    print(f"Memory n={len(library.all_songs):>9}: whole library with indexes {mb(total)} ({total / len(library.all_songs):.0f} bytes per song)")
+
+# --- STORAGE ---
+def bench_storage():
+    import os
+    import tempfile
+    from music_library import MusicLibrary
+    from player import load_songs_from_file, save_songs_to_file, SongJournal
+    from library_db import SongStore
+
+    n = 100_000
+    folder = tempfile.mkdtemp()
+    text_file, db_file = os.path.join(folder, "songs.txt"), os.path.join(folder, "songs.db")
+    library = make_synthetic_library(n)
+    save = _best_of(lambda: save_songs_to_file(library, text_file), repeat=1)
+    store = SongStore(db_file)
+    migrate = _best_of(lambda: store.migrate(text_file), repeat=1)
+    text_load = _best_of(lambda: load_songs_from_file(MusicLibrary(), text_file), repeat=1)
+    db_load = _best_of(lambda: store.load(MusicLibrary()), repeat=1)
+    print(f"Storage n={n:>9}: full songs.txt save {save:5.2f} s | load songs.txt {text_load:5.2f} s"
+          f" | migrate to SQLite {migrate:5.2f} s | load songs.db {db_load:5.2f} s")
+
+    # One like + one play per round, what a full rewrite used to cost every time
+    songs = list(library.all_songs.values())[:200]
+    library.update_song(songs[0], is_liked=songs[0].is_liked) # Sorts the buffered indexes once, outside the timing
+    def changes(backend):
+        backend.attach(library)
+        start = time.perf_counter()
+        for s in songs:
+            library.update_song(s, is_liked=not s.is_liked)
+            s.play()
+        library.on_change = None
+        return (time.perf_counter() - start) / (2 * len(songs))
+    journal = SongJournal(text_file, compact_after=10**9)
+    print(f"Storage n={n:>9}: one change on the UI thread, journal (write-behind) {changes(journal) * 1e3:6.3f} ms"
+          f" | SQLite update {changes(store) * 1e3:6.3f} ms")
+    journal.close()
+    store.close()
+
+# --- STARTUP ---
+def _load_all_lines(library, filename):
+    # The old loader: readlines() the whole file, then add_song() line by line before the window shows
+    with open(filename, 'r', encoding='utf-8') as file:
+        for line in file.readlines()[1:]:
+            p = line.strip().split('|')
+            library.add_song(p[0], p[1], p[2], int(p[3]), int(p[4]), p[5], p[6], p[7], p[8] == "True", int(p[9]))
+
+def bench_startup():
+    import os
+    import tempfile
+    import tracemalloc
+    from itertools import islice
+    from music_library import MusicLibrary
+    from player import read_songs_file, _write_rows
+    from snapshot import write_snapshot, open_snapshot
+
+    n = 100_000
+    filename = os.path.join(tempfile.mkdtemp(), "songs.txt")
+    _write_rows(filename, [tuple(map(str, row)) for row in make_synthetic_rows(n)])
+
+    start = time.perf_counter()
+    _load_all_lines(MusicLibrary(), filename)
+    old = time.perf_counter() - start
+
+    # Streaming in chunks like the app does (gui_main's LOAD_CHUNK): the window is up
+    # after the first one, the list view catches up once a second (LOAD_REFRESH_MS)
+    chunk_size, refresh = 500, 1.0
+    library, rows = MusicLibrary(), read_songs_file(filename)
+    start = last_refresh = time.perf_counter()
+    first = None
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        library.add_songs(args for _, args in chunk)
+        if first is None: first = time.perf_counter() - start
+        if len(chunk) < chunk_size or time.perf_counter() - last_refresh > refresh:
+            library.get_sorted_song_list()
+            last_refresh = time.perf_counter()
+        if len(chunk) < chunk_size: break
+    streamed = time.perf_counter() - start
+
+    print(f"Startup n={n:>9}: old load {old:5.2f} s before the window shows | streamed: first songs after "
+          f"{first * 1e3:5.1f} ms, all in after {streamed:5.2f} s")
+
+    # From the binary snapshot: the whole sorted list is on screen (30 rows built) before anything is parsed
+    songs = library.sorted_songs("default")
+    write_snapshot(filename, [s.to_string() for s in songs], [library.song_words(s) for s in songs])
+    start = time.perf_counter()
+    snapshot = open_snapshot(filename)
+    for i in range(30): snapshot[i]
+    shown = time.perf_counter() - start
+    MusicLibrary().add_songs(row for _, row in snapshot.rows())
+    from_snapshot = time.perf_counter() - start
+    print(f"Startup n={n:>9}: snapshot: all {len(snapshot)} songs on screen after {shown * 1e3:5.1f} ms,"
+          f" all in after {from_snapshot:5.2f} s")
+
+    def peak(read):
+        tracemalloc.start()
+        read()
+        used = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return used / 2**20
+    def read_all():
+        with open(filename, 'r', encoding='utf-8') as file: file.readlines()
+    print(f"Startup n={n:>9}: reading the file, peak memory readlines() {peak(read_all):6.1f} MB"
+          f" | streamed {peak(lambda: sum(1 for _ in read_songs_file(filename))):6.2f} MB")
+
+# --- FOLDER SCAN ---
+def _write_synthetic_mp3(path, title, artist, album, track, frames=40):
+    """A small MP3: an ID3v2.3 tag, then constant bitrate frames of silence (128 kbps, 44.1 kHz)."""
+    tag = b""
+    for frame_id, text in ((b"TIT2", title), (b"TPE1", artist), (b"TALB", album), (b"TRCK", str(track))):
+        body = b"\x03" + text.encode("utf-8")
+        tag += frame_id + len(body).to_bytes(4, "big") + b"\x00\x00" + body
+    size = bytes((len(tag) >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    with open(path, "wb") as f:
+        f.write(b"ID3\x03\x00\x00" + size + tag + (b"\xff\xfb\x90\x00" + bytes(413)) * frames)
+
+# --- MEDIA PROBE ---
+def bench_probe():
+    import os
+    import tempfile
+    from media_probe import probe
+
+    # An hour of audio each: constant bitrate, VBR with a Xing header, VBR without one (walked frame by frame)
+    folder = tempfile.mkdtemp()
+    frames = 3600 * 44100 // 1152
+    f128 = b"\xff\xfb\x90\x00" + bytes(413)   # 128 kbps
+    f320 = b"\xff\xfb\xe0\x00" + bytes(1040)  # 320 kbps
+    xing = bytearray(f128)
+    xing[36:48] = b"Xing" + (1).to_bytes(4, "big") + frames.to_bytes(4, "big")
+    files = {"cbr": f128 * frames, "vbr + xing": bytes(xing) + (f128 + f320) * (frames // 2),
+             "vbr, scanned": (f128 + f320) * (frames // 2)}
+    for name, data in files.items():
+        path = os.path.join(folder, name.replace(" ", "").replace(",", "") + ".mp3")
+        with open(path, "wb") as f: f.write(data)
+        seconds = _best_of(lambda: probe(path), repeat=3)
+        print(f"Probe {name:>12}: {len(data) / 2**20:6.1f} MB file, {seconds * 1000:8.2f} ms, duration {probe(path)['duration']} s")
+
+def bench_scan():
+    import os
+    import tempfile
+    from media_probe import probe
+    from music_library import MusicLibrary
+    from folder_scanner import FolderScanner, FingerprintIndex, walk_folder
+
+    n = 10_000
+    folder = tempfile.mkdtemp()
+    for i in range(n):
+        directory = os.path.join(folder, f"Artist {i % 100}", f"Album {i % 1000}")
+        os.makedirs(directory, exist_ok=True)
+        _write_synthetic_mp3(os.path.join(directory, f"{i % 12 + 1:02d} Track {i}.mp3"),
+                             f"Track {i}", f"Artist {i % 100}", f"Album {i % 1000}", i % 12 + 1)
+
+    start = time.perf_counter()
+    paths = [p for _, files, _ in walk_folder(folder) for p, _ in files]
+    walk = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in paths: probe(p)
+    one = time.perf_counter() - start
+
+    # The app's scan, with a stand-in for Tk's after() loop
+    class Pump:
+        def __init__(self): self.jobs = []
+        def after(self, ms, fn): self.jobs.append(fn)
+    pump, library = Pump(), MusicLibrary()
+    scanner = FolderScanner(pump, library, FingerprintIndex(os.path.join(folder, "fingerprints.txt")))
+    def scan():
+        done = []
+        scanner.on_done = lambda added, cancelled: done.append(added)
+        start = time.perf_counter()
+        scanner.start(folder)
+        while not done:
+            time.sleep(0.01)
+            jobs, pump.jobs = pump.jobs, []
+            for job in jobs: job()
+        return time.perf_counter() - start, done[0]
+    first, added = scan()
+    again, _ = scan()
+    print(f"Scan n={n:>9}: walk {walk * 1000:7.1f} ms | probe in one process {n / one * 60:9,.0f} files/min"
+          f" | full scan ({os.cpu_count()} CPUs) {first:5.2f} s = {n / first * 60:9,.0f} files/min, {added} added"
+          f" | rescan, nothing changed {again * 1000:6.1f} ms ({scanner.to_probe} files read)")
+
+BENCHMARKS = {
+    "queue": bench_queue,
+    "search": bench_search,
+    "fuzzy": bench_fuzzy,
+    "memory": bench_memory,
+    "storage": bench_storage,
+    "startup": bench_startup,
+    "scan": bench_scan,
+    "probe": bench_probe,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Choose from: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
@@ -0,0 +1,136 @@
+import io
+import math
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from media_probe import probe
+
+CROSSFADE_MAX = 12       # Longest crossfade offered, in seconds
+HANDOFF_MARGIN = 2.0     # Seconds decoded past the fade (rounded up to whole seconds), so the stream never takes over late
+HANDOFF_FADE_MS = 80     # The decoded start and the stream overlap this long when the stream takes over
+BUFFER_BUDGET_MB = 128   # Most memory one decode may take (an MP3 is decoded whole before its start is cut out)
+
+def decode_start(path, seconds, budget, duration=0):
+    """
+    The first `seconds` of a song as a pygame Sound, or None if decoding it would take more than
+    budget bytes. WAVs only have their start read; anything else has to be decoded whole by
+    pygame first, so its size is estimated (from duration, or the file's headers) before that.
+    Runs on the decoder thread.
+    """
+    freq, size, channels = pygame.mixer.get_init()
+    with open(path, "rb") as f: riff = f.read(12)
+    if riff[:4] == b"RIFF" and riff[8:12] == b"WAVE":
+        try:
+            with wave.open(path, "rb") as song:
+                frames = song.readframes(int(song.getframerate() * seconds))
+                start = io.BytesIO()
+                with wave.open(start, "wb") as out:
+                    out.setparams(song.getparams())
+                    out.writeframes(frames)
+            start.seek(0)
+            return pygame.mixer.Sound(file=start) # SDL converts it to the mixer's format
+        except wave.Error: pass # Not plain PCM, decode it like the rest
+    duration = duration or probe(path).get("duration", 0)
+    if not duration or duration * freq * channels * abs(size) // 8 > budget: return None
+    whole = pygame.mixer.Sound(path)
+    with memoryview(whole) as samples: # One item per sample frame
+        return pygame.mixer.Sound(buffer=samples[:int(freq * seconds)])
+
+class CrossfadeEngine:
+    """
+    Crossfades from pygame.mixer.music into the next song. The next song's start is decoded
+    ahead of time on a worker thread (never on the Tk thread) and, when the current song is
+    `seconds` from its end, played on a reserved mixer channel fading in while the music fades
+    out; both ramps are SDL_mixer's own, so they're smooth to the sample. A little later
+    AudioPlayer switches the new song back to streaming from the same position.
+    Memory stays bounded: one decode at a time, only one song's start (seconds + HANDOFF_MARGIN
+    of audio) is kept, and songs whose decode wouldn't fit budget_mb simply don't crossfade.
+    """
+    def __init__(self, budget_mb=BUFFER_BUDGET_MB):
+        self.budget = budget_mb * 2**20
+        self.seconds = 0          # 0: crossfades off
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode")
+        self.song = None          # The song whose start is (being) decoded
+        self.sound = None         # Its decoded start, once ready
+        self.decoded = 0          # Seconds of it asked for, too short once the crossfade is made longer
+        self.skipped = None       # The last song that couldn't be decoded (too big, or an error)
+        self.job = 0              # Bumped by every request, so stale decodes are dropped
+        self.started = None       # time.monotonic() when the channel started, None when not fading
+        self.length = 0           # Seconds into the new song when the stream takes over
+        self.channel = None
+        if pygame.mixer.get_init():
+            pygame.mixer.set_reserved(1)
+            self.channel = pygame.mixer.Channel(0)
+
+    def prepare(self, song):
+        """Starts decoding song's start, unless it's already done or under way."""
+        if not self.seconds or self.channel is None or song is self.skipped: return
+        if song is self.song and self.decoded >= self.seconds + HANDOFF_MARGIN: return
+        with self.lock:
+            self.job += 1
+            self.song, self.sound = song, None
+            job, seconds = self.job, self.seconds + HANDOFF_MARGIN
+            self.decoded = seconds
+        self.pool.submit(self._decode, job, song, seconds)
+
+    def _decode(self, job, song, seconds):
+        # Decoder thread: pygame decoding only, no Tk and no player state
+        with self.lock:
+            if job != self.job: return # Replaced before it started
+        try: sound = decode_start(song.filepath, seconds, self.budget, song.duration)
+        except Exception as e:
+            print(f"Crossfade decode error: {e}")
+            sound = None
+        with self.lock:
+            if job != self.job: return
+            self.sound = sound
+            if sound is None: self.song, self.skipped = None, song
+
+    def ready(self, song):
+        return self.song is song and self.sound is not None and self.decoded >= self.seconds + HANDOFF_MARGIN
+
+    def will_fade(self, song):
+        """False when song can't crossfade in (so it should simply follow gaplessly)."""
+        return bool(self.seconds) and self.channel is not None and song is not self.skipped
+
+    @property
+    def fading(self):
+        return self.started is not None
+
+    def start(self, seconds):
+        """Plays the prepared start on the channel, fading in over seconds."""
+        with self.lock:
+            sound, self.song, self.sound = self.sound, None, None
+        self.channel.play(sound, fade_ms=int(seconds * 1000))
+        self.started = time.monotonic()
+        # Hand over to the stream on a whole second: pygame seeks some formats (WAV) in whole seconds.
+        # Never past the end of the decoded start (a short song's is shorter than asked for)
+        self.length = min(math.ceil(seconds), int(sound.get_length()))
+
+    def position(self):
+        """Seconds into the new song while it plays from the channel."""
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    def finish(self):
+        """The stream took over: fade the channel out under it."""
+        if self.started is None: return
+        self.channel.fadeout(HANDOFF_FADE_MS)
+        self.started = None
+
+    def cancel(self):
+        """Drops the prepared start and silences a running fade."""
+        with self.lock:
+            self.job += 1
+            self.song, self.sound = None, None
+        if self.started is not None:
+            self.channel.stop()
+            self.started = None
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
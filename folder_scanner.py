@@ -0,0 +1,393 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from media_probe import AUDIO_EXTENSIONS, probe
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+COVER_NAMES = ("cover", "folder", "front", "album") # Preferred album art file names in a song's folder
+PROBE_BATCH = 64   # Files per process pool task, fewer and bigger messages between the processes
+ADD_BATCH = 500    # Most songs handed to the library per pump
+FINGERPRINT_HEADER = "SIZE|MTIME_NS|INODE|FILEPATH\n"
+
+def walk_folder(folder, unreadable=None):
+    """
+    Yields (directory, [(audio file path, fingerprint)], cover image path or "") for every
+    directory under folder that has songs. One os.scandir() per directory, which already knows
+    each entry's type, so only the audio files get a stat() (for their fingerprint, see
+    fingerprint()). Hidden directories and symlinked ones are skipped; directories that can't
+    be read are added to the unreadable list, if one is given.
+    """
+    stack = [folder]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries: entries = list(entries)
+        except OSError as e:
+            print(f"Can't read {directory}: {e}")
+            if unreadable is not None: unreadable.append(directory)
+            continue
+        audio, images = [], []
+        for entry in entries:
+            name = entry.name.lower()
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not name.startswith("."): stack.append(entry.path)
+                elif name.endswith(AUDIO_EXTENSIONS): audio.append((entry.path, fingerprint(entry)))
+                elif name.endswith(IMAGE_EXTENSIONS): images.append(entry)
+            except OSError: pass
+        if audio:
+            covers = [e.path for e in images if os.path.splitext(e.name)[0].lower() in COVER_NAMES]
+            yield directory, sorted(audio), (covers or sorted(e.path for e in images) or [""])[0]
+
+def fingerprint(entry):
+    """(size, mtime in ns, inode) of a scandir entry: if none of them changed, neither did the file."""
+    st = entry.stat()
+    return st.st_size, st.st_mtime_ns, entry.inode()
+
+def song_args(path, info, cover=""):
+    """add_song() arguments for a probed file, falling back to the file and folder names."""
+    # songs.txt is "|" separated, one song per line
+    text = lambda name, default: " ".join(info.get(name, "").replace("|", "/").split()) or default
+    title = text("title", os.path.splitext(os.path.basename(path))[0])
+    album = text("album", os.path.basename(os.path.dirname(path)))
+    return (title, text("artist", "Unknown Artist"), album, info.get("track", 0),
+            info.get("duration", 0), text("genre", "Unknown"), path, cover)
+
+def _probe_files(files, cover):
+    # Runs in a worker process: only files here, no library or Tk
+    rows = []
+    for path, fp in files:
+        try: rows.append((path, fp, song_args(path, probe(path), cover)))
+        except (OSError, ValueError, IndexError) as e:
+            print(f"Skipped {path}: {e}")
+            rows.append((path, fp, None))
+    return rows
+
+def _probe_durations(paths):
+    # Worker process, like _probe_files(): (path, duration or None) per file
+    durations = []
+    for path in paths:
+        try: durations.append((path, probe(path).get("duration")))
+        except (OSError, ValueError, IndexError): durations.append((path, None))
+    return durations
+
+def _process_pool(workers):
+    # "spawn" everywhere: forking a process that runs Tk and other threads isn't safe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+class FingerprintIndex:
+    """
+    path -> (size, mtime_ns, inode) of every song file a scan has read, kept next to the
+    library (e.g. songs.txt.fingerprints), so the next scan of the folder only reads the files
+    that are new or changed. Loaded on first use, saved (temp file + rename) after each scan.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = None
+        self.changed = False
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.filename): return
+        with open(self.filename, "r", encoding="utf-8", errors="replace") as file:
+            next(file, None) # Header
+            for line in file:
+                parts = line.rstrip("\n").split("|", 3) # The path goes last, it may contain anything
+                try: self.entries[parts[3]] = (int(parts[0]), int(parts[1]), int(parts[2]))
+                except (IndexError, ValueError): pass
+
+    def set(self, path, fp):
+        if self.entries.get(path) != fp:
+            self.entries[path] = fp
+            self.changed = True
+
+    def remove(self, path):
+        if self.entries.pop(path, None) is not None: self.changed = True
+
+    def save(self):
+        if not self.changed: return
+        tmp = self.filename + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as file:
+                file.write(FINGERPRINT_HEADER)
+                file.writelines(f"{s}|{m}|{i}|{path}\n" for path, (s, m, i) in self.entries.items())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp, self.filename)
+            self.changed = False
+        except OSError as e:
+            print(f"Error saving {self.filename}: {e}")
+
+class FolderScanner:
+    """
+    Imports every MP3/WAV under a folder into the library without freezing the window.
+    A thread walks the folder and hands the files, PROBE_BATCH at a time, to a process
+    pool that reads their tags and lengths from the headers. The results come back to the
+    Tk thread through a short after() pump (like ImageLoader) and go into the library
+    ADD_BATCH at a time, so the list can fill in while the scan runs.
+
+    With a FingerprintIndex, scanning the same folder again is incremental: files whose
+    size, mtime and inode didn't change aren't read at all, changed files update their song
+    (likes and plays stay), a file that shows up elsewhere with the same fingerprint is a
+    move (only the song's path changes) and songs whose files are gone are removed.
+    on_progress(checked, probed, to_probe) and on_done(added, cancelled) are called on the Tk thread.
+    """
+    def __init__(self, root, library, index=None, workers=None):
+        self.root = root
+        self.library = library
+        self.index = index
+        self.workers = workers # None: one process per CPU
+        self.on_progress = None
+        self.on_done = None
+        self.running = False
+        self.cancelled = False
+        self.pool = None
+        self.pump_id = None
+
+    def start(self, folder):
+        if self.running: return False
+        folder = os.path.normpath(folder) # The same folder must give the same paths every time
+        self.running = True
+        self.cancelled = False
+        self.checked = self.to_probe = self.probed = self.failed = 0
+        self.added = self.updated = self.moved = self.removed = 0
+        self.error = False
+        self.tasks_done = 0
+        self.tasks_total = None # Known once the walk is over
+        self.results = queue.Queue()
+        self.rows = []          # Probed, waiting to go into the library
+        # Files already in the library aren't added again, so a scan never resets their likes and plays
+        self.songs_by_path = {s.filepath: s for s in self.library.all_songs.values()}
+        if self.index is not None and self.index.entries is None: self.index.load()
+        # The walker gets its own copies, the Tk thread keeps changing the originals
+        known = dict(self.index.entries) if self.index is not None else {}
+        self.pool = _process_pool(self.workers)
+        threading.Thread(target=self._walk, args=(folder, known, set(self.songs_by_path)), daemon=True).start()
+        self._schedule_pump()
+        return True
+
+    def cancel(self):
+        """Stops the scan. Songs already added stay in the library."""
+        if not self.running: return
+        self.cancelled = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        parts = [f"{self.added} added"]
+        for count, what in ((self.updated, "updated"), (self.moved, "moved"), (self.removed, "removed"), (self.failed, "unreadable")):
+            if count: parts.append(f"{count} {what}")
+        return ", ".join(parts)
+
+    # --- WALKER THREAD (no library or Tk calls here) ---
+    def _walk(self, folder, known, library_paths):
+        tasks, seen, moved_from, unreadable = 0, set(), set(), []
+        # Moves within a disk keep the inode, moves to another one usually keep size and mtime
+        by_fingerprint = {fp: path for path, fp in known.items()}
+        by_fingerprint.update({fp[:2]: path for path, fp in known.items()})
+        complete = False
+        try:
+            for _, files, cover in walk_folder(folder, unreadable):
+                if self.cancelled: break
+                to_probe, unindexed = [], []
+                for path, fp in files:
+                    seen.add(path)
+                    old = known.get(path)
+                    if old == fp: continue # Unchanged since the last scan
+                    if path in library_paths:
+                        # Added by hand (or before there was an index): only remember it
+                        if old is None: unindexed.append((path, fp))
+                        else: to_probe.append((path, fp))
+                        continue
+                    if old is None:
+                        source = by_fingerprint.get(fp) or by_fingerprint.get(fp[:2])
+                        if source and source not in seen and source in library_paths and not os.path.exists(source):
+                            moved_from.add(source)
+                            self.results.put(("moved", (source, path, fp)))
+                            continue
+                    to_probe.append((path, fp))
+                self.results.put(("files", (len(files), len(to_probe), unindexed)))
+                for i in range(0, len(to_probe), PROBE_BATCH):
+                    future = self.pool.submit(_probe_files, to_probe[i:i + PROBE_BATCH], cover)
+                    future.add_done_callback(self.results.put)
+                    tasks += 1
+            complete = not self.cancelled
+        except RuntimeError: pass # Pool shut down by cancel()
+        except Exception as e: print(f"Scan Error: {e}")
+        # Files the index has under this folder that the walk didn't see are gone. Only trusted
+        # after a complete walk, and never for directories that couldn't be read
+        missing = []
+        if complete:
+            prefix = os.path.join(folder, "")
+            skip = tuple(os.path.join(d, "") for d in unreadable)
+            missing = [p for p in known if p.startswith(prefix) and p not in seen and p not in moved_from
+                       and not (skip and p.startswith(skip))]
+        self.results.put(("walked", (tasks, missing)))
+
+    # --- TK THREAD ---
+    def _schedule_pump(self):
+        if self.pump_id is None: self.pump_id = self.root.after(50, self._pump)
+
+    def _pump(self):
+        self.pump_id = None
+        while len(self.rows) < ADD_BATCH:
+            try: item = self.results.get_nowait()
+            except queue.Empty: break
+            if isinstance(item, tuple):
+                kind, value = item
+                if self.cancelled: continue
+                if kind == "files":
+                    checked, to_probe, unindexed = value
+                    self.checked += checked
+                    self.to_probe += to_probe
+                    for path, fp in unindexed: self._remember(path, fp)
+                elif kind == "moved": self._move(*value)
+                else:
+                    self.tasks_total, missing = value
+                    for path in missing: self._remove(path)
+                continue
+            self.tasks_done += 1
+            try: rows = item.result()
+            except Exception as e: # Cancelled, or the pool broke
+                if not self.cancelled and not self.error: print(f"Scan Error: {e!r}")
+                self.error = self.error or not self.cancelled
+                continue
+            self.probed += len(rows)
+            self.failed += sum(1 for row in rows if row[2] is None)
+            self.rows += [row for row in rows if row[2] is not None]
+
+        if not self.cancelled and self.rows:
+            batch, self.rows = self.rows[:ADD_BATCH], self.rows[ADD_BATCH:]
+            self._apply(batch)
+        if self.on_progress: self.on_progress(self.checked, self.probed, self.to_probe)
+        if self.cancelled or (self.tasks_total == self.tasks_done and not self.rows): self._finish()
+        else: self._schedule_pump()
+
+    def _remember(self, path, fp):
+        if self.index is not None: self.index.set(path, fp)
+
+    def _apply(self, batch):
+        new = []
+        for path, fp, args in batch:
+            self._remember(path, fp)
+            song = self.songs_by_path.get(path)
+            if song is None or song.library is not self.library:
+                new.append(args)
+                continue
+            # The file changed: new tags and length, same song (title, likes and plays stay)
+            _, artist, album, track_number, duration, genre, _, _ = args
+            self.library.update_song(song, artist=artist, album=album, track_number=track_number,
+                                     duration=duration, genre=genre)
+            self.updated += 1
+        self.added += self.library.add_songs(self._new_rows(new))
+
+    def _move(self, old_path, new_path, fp):
+        song = self.songs_by_path.pop(old_path, None)
+        if self.index is not None: self.index.remove(old_path)
+        self._remember(new_path, fp)
+        if song is None or song.library is not self.library: return
+        self.library.update_song(song, filepath=new_path)
+        self.songs_by_path[new_path] = song
+        self.moved += 1
+
+    def _remove(self, path):
+        song = self.songs_by_path.pop(path, None)
+        if self.index is not None: self.index.remove(path)
+        if song is not None and song.library is self.library and song.filepath == path:
+            self.library.delete_song(song.title)
+            self.removed += 1
+
+    def _new_rows(self, rows):
+        """Leaves out files the library already has and renames clashing titles (titles are the library's keys)."""
+        # A generator: add_songs() inserts each row before the next title is checked
+        for row in rows:
+            path = row[6]
+            if path in self.songs_by_path: continue
+            title, n = row[0], 1
+            while title.lower() in self.library.all_songs:
+                n += 1
+                title = f"{row[0]} ({row[1]})" if n == 2 else f"{row[0]} ({n - 1})"
+            yield (title,) + row[1:]
+
+    def _finish(self):
+        self.running = False
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = None
+        self.rows = []
+        if self.index is not None: self.index.save()
+        if self.on_done: self.on_done(self.added, self.cancelled)
+
+class DurationFixer:
+    """
+    The library's "fix durations" action: reads every song's length again from its file's
+    headers (in a process pool, like FolderScanner) and corrects the songs whose stored
+    duration is off. Songs whose file can't be read keep theirs.
+    on_progress(checked, total) and on_done(fixed, cancelled) are called on the Tk thread.
+    """
+    def __init__(self, root, library, workers=None):
+        self.root = root
+        self.library = library
+        self.workers = workers
+        self.on_progress = None
+        self.on_done = None
+        self.running = False
+        self.cancelled = False
+        self.pool = None
+        self.pump_id = None
+
+    def start(self, songs):
+        if self.running: return False
+        self.running = True
+        self.cancelled = False
+        self.checked = self.fixed = self.unreadable = 0
+        self.total = len(songs)
+        self.songs_by_path = {}
+        for song in songs: self.songs_by_path.setdefault(song.filepath, []).append(song)
+        self.results = queue.Queue()
+        self.pool = _process_pool(self.workers)
+        paths = list(self.songs_by_path)
+        self.tasks = self.tasks_done = 0
+        for i in range(0, len(paths), PROBE_BATCH):
+            self.pool.submit(_probe_durations, paths[i:i + PROBE_BATCH]).add_done_callback(self.results.put)
+            self.tasks += 1
+        self._schedule_pump()
+        return True
+
+    def cancel(self):
+        if not self.running: return
+        self.cancelled = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_pump(self):
+        if self.pump_id is None: self.pump_id = self.root.after(50, self._pump)
+
+    def _pump(self):
+        self.pump_id = None
+        while not self.cancelled:
+            try: future = self.results.get_nowait()
+            except queue.Empty: break
+            self.tasks_done += 1
+            try: durations = future.result()
+            except Exception as e:
+                print(f"Duration Check Error: {e!r}")
+                continue
+            for path, duration in durations:
+                for song in self.songs_by_path[path]:
+                    self.checked += 1
+                    if duration is None: self.unreadable += 1
+                    elif song.library is self.library and song.duration != duration:
+                        self.library.update_song(song, duration=duration)
+                        self.fixed += 1
+        if self.on_progress: self.on_progress(self.checked, self.total)
+        if self.cancelled or self.tasks_done == self.tasks: self._finish()
+        else: self._schedule_pump()
+
+    def _finish(self):
+        self.running = False
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = None
+        self.songs_by_path = {}
+        if self.unreadable: print(f"Fix durations: {self.unreadable} files couldn't be read.")
+        if self.on_done: self.on_done(self.fixed, self.cancelled)
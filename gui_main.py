@@ -3,16 +3,29 @@ from tkinter import ttk, filedialog, font, messagebox
 import os
 import pygame
 import random
-from PIL import Image, ImageTk, ImageDraw, ImageOps
+from PIL import Image, ImageTk
 import ctypes
 import csv
+import gc
+import time
+from itertools import islice
 
 try: ctypes.windll.shcore.SetProcessDpiAwareness(1)
 except: pass
 
-from music_library import MusicLibrary, _format_duration
-from player import (load_songs_from_file, save_songs_to_file)
+from music_library import MusicLibrary, SORT_KEYS, FILTER_SCAN_LIMIT, _format_duration
+from search import tokenize
+from player import read_songs_file, SongJournal
+from library_db import SongStore
+from snapshot import open_snapshot
+from folder_scanner import FolderScanner, FingerprintIndex, DurationFixer
+from media_probe import probe
 from audio_player import AudioPlayer
+from crossfade import CROSSFADE_MAX
+from image_cache import art_cache, get_round_photo, render_round_image
+from image_loader import ImageLoader
+from thumbnail_store import thumb_store
+from text_fit import text_fitter
 
 # --- THEME ---
 ROOT_BG = "#090E12"
@@ -36,6 +49,16 @@ COL_PLAYS_WIDTH = 60
 ALBUM_CARD_WIDTH = 180
 ALBUM_CARD_HEIGHT = 340
 ALBUM_GRID_PAD = 15
+SEARCH_DELAY_MS = 150 # Pause in typing before the search box filters the list
+SEARCH_RESULTS = 1000 # Best matches the search box shows when it searches the whole library
+# Where the library is kept: "text" (songs.txt + journal) or "sqlite" (songs.db). MUSICIFY_STORAGE=sqlite picks it too
+STORAGE = os.environ.get("MUSICIFY_STORAGE", "text")
+LOAD_CHUNK = 500         # Songs added to the library per event loop turn while loading
+LOAD_REFRESH_MS = 1000   # How often the All Songs list catches up with a load or a folder scan
+PUMP_MS = 20             # How often the player handles song ends while something plays
+FRAME_MS = 16            # Progress bar refresh while it's on screen (about the display's 60 Hz)
+# Sidebar text for the storage status
+SAVE_STATUS_TEXT = {"saved": "All changes saved", "saving": "Saving...", "waiting": "Waiting for the disk...", "error": "⚠ Changes not saved"}
 
 # Ratio for Title vs Album columns
 RATIO_TITLE = 0.55
@@ -59,33 +82,10 @@ def create_gradient(width, height, color1, color2):
 def make_round_image(image_path, size, radius=0):
     """
     Loads image, crops to fill square, and applies a TRANSPARENT rounded mask.
-    No background color blending.
+    No background color blending. Results come from the shared LRU art cache.
     """
     try:
-        # 1. Load or Create Placeholder
-        if image_path and os.path.exists(image_path):
-            img = Image.open(image_path).convert("RGBA")
-            img = ImageOps.fit(img, size, method=Image.Resampling.LANCZOS)
-        else:
-            # Transparent placeholder if missing (Invisible)
-            img = Image.new('RGBA', size, (0, 0, 0, 0)) 
-
-        # 2. Apply Rounded Corners (Alpha Masking)
-        if radius > 0:
-            # Super-sampling for smooth edges (4x size)
-            ss_size = (size[0] * 4, size[1] * 4)
-            ss_radius = radius * 4
-            
-            # Mask: White = Visible, Black = Transparent
-            mask = Image.new("L", ss_size, 0)
-            draw = ImageDraw.Draw(mask)
-            draw.rounded_rectangle((0, 0) + ss_size, radius=ss_radius, fill=255)
-            mask = mask.resize(size, Image.Resampling.LANCZOS)
-            
-            # Apply the mask to the image's alpha channel
-            img.putalpha(mask)
-
-        return ImageTk.PhotoImage(img)
+        return get_round_photo(image_path, size, radius)
     except Exception as e:
         print(f"Error making round image: {e}")
         return None
@@ -214,11 +214,16 @@ class AddSongDialog(tk.Toplevel):
         if f:
             self.entries[field].delete(0, tk.END); self.entries[field].insert(0, f)
             if "Audio" in field:
-                try:
-                    snd = pygame.mixer.Sound(f)
-                    self.entries["Duration (s)"].delete(0, tk.END); self.entries["Duration (s)"].insert(0, str(int(snd.get_length())))
-                    if not self.entries["Title"].get(): self.entries["Title"].insert(0, os.path.splitext(os.path.basename(f))[0])
-                except: pass
+                # Length and tags straight from the file's headers, nothing gets decoded
+                try: info = probe(f)
+                except (OSError, ValueError) as e:
+                    print(f"Can't read {f}: {e}")
+                    info = {}
+                if "duration" in info:
+                    self.entries["Duration (s)"].delete(0, tk.END); self.entries["Duration (s)"].insert(0, str(info["duration"]))
+                for name, key in (("Title", "title"), ("Artist", "artist"), ("Album", "album"), ("Track #", "track"), ("Genre", "genre")):
+                    if key in info and not self.entries[name].get(): self.entries[name].insert(0, str(info[key]))
+                if not self.entries["Title"].get(): self.entries["Title"].insert(0, os.path.splitext(os.path.basename(f))[0])
 
     def save(self):
         self.master.library.add_song(
@@ -226,7 +231,6 @@ class AddSongDialog(tk.Toplevel):
             int(self.entries["Track #"].get() or 0), int(self.entries["Duration (s)"].get() or 0),
             self.entries["Genre"].get(), self.entries["Audio File"].get(), self.entries["Album Art"].get()
         )
-        save_songs_to_file(self.master.library)
         self.master.show_all_songs_view()
         self.destroy()
 
@@ -270,6 +274,290 @@ class ScrollableFrame(tk.Frame):
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
+class VirtualList(ScrollableFrame):
+    """
+    ScrollableFrame that only builds the rows inside the viewport (plus a small overscan)
+    and recycles them while scrolling, so the cost stays the same for 20 or 20k items.
+    make_row(parent) builds one empty row, fill_row(row, index, item) points it at an item,
+    and the optional release_row(row) is told when a row scrolls out of view.
+    items only needs len() and indexing, so a live queue can be shown without copying it.
+    Rows live directly on the canvas as window items, so huge lists never create a huge frame.
+    """
+    def __init__(self, container, bg_color=CONTENT_BG, row_height=58, overscan=4, *args, **kwargs):
+        super().__init__(container, bg_color, *args, **kwargs)
+        self.row_height = row_height
+        self.overscan = overscan
+        self.items = []
+        self.is_virtual = False
+        self.make_row = None
+        self.fill_row = None
+        self.release_row = None
+        self.relabel_row = None
+        self.rows = []      # Every row widget we own (the pool)
+        self.visible = {}   # index -> row currently showing that index
+        self.row_width = 0
+        self.canvas.bind("<Configure>", lambda e: self.set_width(e.width), add="+")
+
+    def set_items(self, items, make_row, fill_row, release_row=None):
+        # A different row type can't be recycled, start a fresh pool
+        if not self.is_virtual or make_row != self.make_row:
+            self.clear()
+            self.is_virtual = True
+            self.make_row = make_row
+            self.canvas.itemconfigure(self.frame_window, state="hidden")
+        self.fill_row = fill_row
+        self.release_row = release_row
+        self.items = items
+        for row in self.visible.values():
+            self.canvas.itemconfigure(row.item_id, state="hidden")
+            if release_row: release_row(row)
+        self.visible = {}
+        self.canvas.yview_moveto(0)
+        self._update_region()
+        self._render()
+
+    def update_items(self, items, make_row, fill_row, release_row=None, relabel_row=None, key=id):
+        """
+        Switches to a new version of the list but keeps the scroll position.
+        Rows whose item (matched by key) is still on screen are only moved, and
+        renumbered through relabel_row(row, index) if given; only new items get fill_row.
+        """
+        if not self.is_virtual or make_row != self.make_row:
+            self.set_items(items, make_row, fill_row, release_row)
+            self.relabel_row = relabel_row
+            return
+        self.fill_row = fill_row
+        self.release_row = release_row
+        self.relabel_row = relabel_row
+
+        # Keyed model of what's on screen right now
+        by_key = {}
+        for row in self.visible.values(): by_key.setdefault(key(row.vl_item), []).append(row)
+        self.visible = {}
+        self.items = items
+        self._update_region()
+
+        # Keep the view inside the (possibly shorter) list
+        total = len(items) * self.row_height
+        max_top = max(0, total - self.canvas.winfo_height())
+        if self.canvas.canvasy(0) > max_top: self.canvas.yview_moveto(max_top / total if total else 0)
+
+        first, last = self._visible_range()
+        for idx in range(first, last):
+            rows = by_key.get(key(items[idx]))
+            if not rows: continue
+            row = rows.pop()
+            if row.vl_index != idx:
+                if self.relabel_row: self.relabel_row(row, idx)
+                else: self.fill_row(row, idx, items[idx])
+                self._move_row(row, idx)
+            self.visible[idx] = row
+        if self.release_row:
+            for rows in by_key.values():
+                for row in rows: self.release_row(row)
+        self._render()
+
+    def refresh_rows(self, items=None):
+        """
+        Re-fills the rows on screen after their items were changed in place (e.g. a play
+        count or tags); only the rows showing one of items if given.
+        update_items() can't tell, the item and its index stay the same.
+        """
+        if not self.is_virtual: return
+        changed = None if items is None else {id(item) for item in items}
+        for idx, row in self.visible.items():
+            row.vl_item = self.items[idx]
+            if changed is None or id(row.vl_item) in changed: self.fill_row(row, idx, row.vl_item)
+
+    def set_width(self, width):
+        if not self.is_virtual or width == self.row_width: return
+        self.row_width = width
+        for row in self.rows: self.canvas.itemconfigure(row.item_id, width=width)
+        self._update_region()
+
+    def clear(self):
+        """Leaves virtual mode and empties the frame, so it can be used as a normal ScrollableFrame."""
+        for row in self.rows:
+            self.canvas.delete(row.item_id)
+            row.destroy()
+        for w in self.scrollable_frame.winfo_children(): w.destroy()
+        self.rows = []
+        self.visible = {}
+        self.items = []
+        self.is_virtual = False
+        self.make_row = None
+        self.row_width = 0
+        self.canvas.itemconfigure(self.frame_window, state="normal")
+        self.canvas.yview_moveto(0)
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+
+    def _update_region(self):
+        total = len(self.items) * self.row_height
+        self.canvas.configure(scrollregion=(0, 0, self.row_width, total))
+        if total <= self.canvas.winfo_height(): self.canvas.unbind_all("<MouseWheel>")
+        else: self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+
+    def _on_frame_configure(self, event):
+        # In virtual mode the scroll region comes from the item count, not the frame
+        if not self.is_virtual: super()._on_frame_configure(event)
+
+    def _update_scrollbar(self, first, last):
+        super()._update_scrollbar(first, last)
+        self._render()
+
+    def _visible_range(self):
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.row_height) - self.overscan)
+        last = min(len(self.items), int((top + self.canvas.winfo_height()) // self.row_height) + 1 + self.overscan)
+        return first, last
+
+    def _move_row(self, row, idx):
+        row.vl_index = idx
+        self.canvas.coords(row.item_id, 0, idx * self.row_height)
+        self.canvas.itemconfigure(row.item_id, state="normal")
+
+    def _render(self):
+        if not self.is_virtual: return
+        first, last = self._visible_range()
+
+        # Rows that scrolled out of the window go back to the free list
+        for i in [i for i in self.visible if i < first or i >= last]:
+            row = self.visible.pop(i)
+            if self.release_row: self.release_row(row)
+        in_use = set(self.visible.values())
+        free = [r for r in self.rows if r not in in_use]
+
+        for idx in range(first, last):
+            if idx in self.visible: continue
+            if free:
+                row = free.pop()
+            else:
+                row = self.make_row(self.canvas)
+                row.item_id = self.canvas.create_window(0, 0, window=row, anchor="nw", width=self.row_width, height=self.row_height)
+                self.rows.append(row)
+            row.vl_item = self.items[idx]
+            self.fill_row(row, idx, row.vl_item)
+            self._move_row(row, idx)
+            self.visible[idx] = row
+
+        for row in free: self.canvas.itemconfigure(row.item_id, state="hidden")
+
+class SongRow(tk.Frame):
+    """
+    One recycled row of the song list. The widgets are built once,
+    bind_song() points them at a new song when the row scrolls into view.
+    """
+    def __init__(self, master, on_play, on_menu, bg_color=CONTENT_BG):
+        super().__init__(master, bg=bg_color)
+        self.bg_color = bg_color
+        self.on_play = on_play
+        self.on_menu = on_menu
+        self.index = 0
+        self.song = None
+        self.art_ticket = None # Pending background image load, if any
+        self.grid_propagate(False)
+        self.grid_rowconfigure(0, weight=1)
+
+        # Art (normal lists) or track number (album view) share column 0
+        self.art_cont = tk.Frame(self, width=60, height=48, bg=bg_color, bd=0, highlightthickness=0)
+        self.art_cont.pack_propagate(False)
+        self.lbl_art = tk.Label(self.art_cont, bg=bg_color, bd=0)
+        self.lbl_art.pack(expand=True)
+        self.lbl_track = tk.Label(self, bg=bg_color, fg=TEXT_COLOR)
+
+        # Metadata
+        self.meta = tk.Frame(self, bg=bg_color)
+        self.meta.grid(row=0, column=1, sticky="we", padx=(10, 5))
+        self.lbl_title = tk.Label(self.meta, bg=bg_color, fg=WHITE, font=("Segoe UI", 10), anchor="w")
+        self.lbl_title.pack(fill="x")
+        self.lbl_artist = tk.Label(self.meta, bg=bg_color, fg=TEXT_COLOR, font=("Segoe UI", 9), anchor="w")
+        self.lbl_artist.pack(fill="x")
+
+        self.lbl_album = tk.Label(self, bg=bg_color, fg=TEXT_COLOR, anchor="w")
+        self.lbl_album.grid(row=0, column=2, sticky="we")
+        self.lbl_plays = tk.Label(self, bg=bg_color, fg="#6B7D8C", font=("Segoe UI", 9), anchor="e")
+        self.lbl_plays.grid(row=0, column=3, sticky="e")
+        self.lbl_dur = tk.Label(self, bg=bg_color, fg=TEXT_COLOR, anchor="e")
+        self.lbl_dur.grid(row=0, column=4, sticky="e", padx=(0, 10))
+
+        self.cells = [self, self.art_cont, self.lbl_art, self.lbl_track, self.meta, self.lbl_title,
+                      self.lbl_artist, self.lbl_album, self.lbl_plays, self.lbl_dur]
+        for w in self.cells:
+            w.bind("<Enter>", self._on_enter); w.bind("<Leave>", self._on_leave); w.bind("<Button-3>", self._on_right_click)
+        for w in [self.art_cont, self.lbl_art, self.meta, self.lbl_title, self.lbl_artist]:
+            w.bind("<Button-1>", self._on_click)
+
+    def bind_song(self, index, song, is_album, icon=None):
+        self.index = index
+        self.song = song
+        if is_album:
+            self.art_cont.grid_forget()
+            self.lbl_track.config(text=str(song.track_number))
+            self.lbl_track.grid(row=0, column=0, sticky="w", pady=8, padx=(15, 0))
+        else:
+            self.lbl_track.grid_forget()
+            self.set_art(icon)
+            self.art_cont.grid(row=0, column=0, sticky="w", pady=5, padx=(10, 0))
+        self.lbl_title.config(text=song.title)
+        self.lbl_artist.config(text=song.artist)
+        self.lbl_album.config(text=song.album)
+        self.lbl_plays.config(text=f"{song.play_count} plays")
+        self.lbl_dur.config(text=_format_duration(song.duration))
+        self._set_bg(self.bg_color)
+
+    def set_art(self, icon):
+        self.lbl_art.config(image=icon)
+        self.lbl_art.image = icon # Keep a reference or Tk drops the image
+
+    def set_columns(self, w_title, w_album):
+        self.grid_columnconfigure(0, minsize=COL_ART_WIDTH, weight=0)
+        self.grid_columnconfigure(1, minsize=w_title, weight=0)
+        self.grid_columnconfigure(2, minsize=w_album, weight=0)
+        self.grid_columnconfigure(3, minsize=COL_PLAYS_WIDTH, weight=0)
+        self.grid_columnconfigure(4, minsize=COL_DUR_WIDTH, weight=0)
+
+    def _set_bg(self, color):
+        for w in self.cells: w.config(bg=color)
+
+    def _on_enter(self, event): self._set_bg(HOVER_COLOR)
+    def _on_leave(self, event): self._set_bg(self.bg_color)
+    def _on_click(self, event): self.on_play(self.index)
+    def _on_right_click(self, event): self.on_menu(event, self.song)
+
+class QueueRow(tk.Frame):
+    """One recycled row of the "Up Next" panel."""
+    def __init__(self, master, on_play):
+        super().__init__(master, bg=QUEUE_BG, height=60)
+        self.pack_propagate(False)
+        self.on_play = on_play
+        self.index = 0
+        self.song = None
+
+        self.lbl_num = tk.Label(self, bg=QUEUE_BG, fg=TEXT_COLOR, width=4)
+        self.lbl_num.pack(side="left")
+
+        self.info = tk.Frame(self, bg=QUEUE_BG)
+        self.info.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        self.lbl_title = tk.Label(self.info, bg=QUEUE_BG, fg=WHITE, font=("Segoe UI", 9, "bold"), anchor="w")
+        self.lbl_title.pack(fill="x")
+        self.lbl_artist = tk.Label(self.info, bg=QUEUE_BG, fg=TEXT_COLOR, font=("Segoe UI", 8), anchor="w")
+        self.lbl_artist.pack(fill="x")
+
+        for w in (self, self.lbl_num, self.info, self.lbl_title, self.lbl_artist):
+            w.bind("<Double-Button-1>", lambda e: self.on_play(self.index))
+            w.bind("<Enter>", lambda e: self.config(bg=HOVER_COLOR))
+            w.bind("<Leave>", lambda e: self.config(bg=QUEUE_BG))
+
+    def bind_song(self, index, song):
+        self.song = song
+        self.set_index(index)
+        self.config(bg=QUEUE_BG)
+
+    def set_index(self, index):
+        # Cheap renumbering when the row just moved (e.g. the head song was played)
+        self.index = index
+        self.lbl_num.config(text=str(index + 1))
+
 class MusicifyApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -286,34 +574,77 @@ class MusicifyApp(tk.Tk):
         self.configure(bg=ROOT_BG)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
         
-        self.library = MusicLibrary(); load_songs_from_file(self.library)
+        self.library = MusicLibrary()
+        # Songs are streamed in after the window is up (see start_loading)
+        if STORAGE == "sqlite": self.store = SongStore() # songs.db, created from songs.txt the first time
+        else: self.store = SongJournal() # songs.txt + a journal of the changes since it was written
+        self.load_job = None
+        self.load_progress = None  # Fraction loaded, None once everything is in
+        self.load_rows = None
+        self.snapshot = None       # songs.txt's binary snapshot while loading from it
+        self.early_changes = []    # Changes made while loading, saved once the load is done
+        self.last_live_refresh = 0
+        # Music folders are imported in the background (see scan_folder). The fingerprints of the
+        # files they had make scanning the same folder again only read what changed
+        self.scanner = FolderScanner(self, self.library, FingerprintIndex(self.store.filename + ".fingerprints"))
+        self.scanner.on_progress = self.on_scan_progress
+        self.scanner.on_done = self.on_scan_done
+        self.duration_fixer = DurationFixer(self, self.library)
+        self.duration_fixer.on_progress = self.on_fix_progress
+        self.duration_fixer.on_done = self.on_fix_done
+        self.scan_text = None      # Sidebar status while a scan (or a duration fix) runs
+        self.scan_folder_path = None
         self.player = AudioPlayer()
         self.player.on_song_changed = self.update_now_playing_ui
         self.player.on_queue_changed = self.update_queue_ui
-        self.player.on_playback_state_changed = self.update_play_icon
+        self.player.on_playback_state_changed = self.on_playback_state
+        self.pump_job = None      # Both only run while something plays (and the progress bar is visible)
+        self.progress_job = None
+        self.progress_shown = None
+
+        # Album art is decoded on worker threads and swapped in when ready
+        self.art_loader = ImageLoader(self)
         
         self.current_view_songs = []
+        self.view_songs = []      # The list view before the search box filtered it
+        self.search_timer = None
+        self.search_job = None
+        self.search_done = None   # (terms, songs) of the last finished filter
         self.image_refs = {} 
         self.grad_img = None 
         self.view_mode = "list"
+        self.sidebar_mode = "all"
         self.album_cards = []
-        self.queue_labels = []
+        self.list_col_widths = (0, 0)
         self.resize_timer = None
         self.last_cols = 0
         self.is_album_view = False 
         
         self.font_title = font.Font(family="Segoe UI", size=9, weight="bold")
         self.font_artist = font.Font(family="Segoe UI", size=8)
+        # Same fonts as the SongRow labels, used to ellipsize the list columns
+        self.font_row_title = font.Font(family="Segoe UI", size=10)
+        self.font_row_artist = font.Font(family="Segoe UI", size=9)
+        self.font_row_album = font.nametofont("TkDefaultFont")
         
         self.autoplay_var = tk.BooleanVar(value=True)
+        self.gapless_var = tk.BooleanVar(value=self.player.gapless)
+        self.crossfade_var = tk.IntVar(value=self.player.crossfade.seconds)
 
         self.setup_ui()
         self.show_all_songs_view()
+        self.start_loading()
         
         self.after(100, self.force_layout)
-        self.after(100, self.update_progress)
+        self.after(250, self.update_save_status)
+
+        self.bind('<space>', self.on_space_key)
+        self.bind('<Map>', lambda e: e.widget is self and self.wake_progress())
 
-        self.bind('<space>', lambda event: self.player.toggle_playback())
+    def on_space_key(self, event):
+        # A space typed into the search box is just a space
+        if isinstance(event.widget, tk.Entry): return
+        self.player.toggle_playback()
 
     def force_layout(self):
         self.update_idletasks()
@@ -350,32 +681,23 @@ class MusicifyApp(tk.Tk):
         self.header_canvas.itemconfigure("controls", state="hidden")
         self.set_sidebar_active("liked")
         
-        # Filter songs where is_liked is True
-        liked_songs = [s for s in self.library.all_songs.values() if s.is_liked]
-        
-        # Sort them (optional, here by Artist)
-        liked_songs.sort(key=lambda s: s.artist)
-        
-        self.refresh_list(liked_songs, is_album=False)
+        # Liked songs come from the library's liked index, sorted by Artist
+        self.refresh_list(self.library.get_liked_songs(), is_album=False)
         self.update_play_icon(self.player.is_playing)
 
     def show_most_played_view(self):
         self.header_canvas.itemconfig(self.title_text_id, text="Most Played")
         self.header_canvas.itemconfigure("controls", state="hidden")
         self.set_sidebar_active("most")
-        # Sort by play count descending
-        songs = list(self.library.all_songs.values())
-        songs.sort(key=lambda s: s.play_count, reverse=True)
-        self.refresh_list(songs, is_album=False)
+        # Play count descending, straight from the library's sorted index
+        self.refresh_list(self.library.sorted_songs("plays", reverse=True), is_album=False)
 
     def show_rarely_played_view(self):
         self.header_canvas.itemconfig(self.title_text_id, text="Rarely Played")
         self.header_canvas.itemconfigure("controls", state="hidden")
         self.set_sidebar_active("rare")
-        # Sort by play count ascending
-        songs = list(self.library.all_songs.values())
-        songs.sort(key=lambda s: s.play_count)
-        self.refresh_list(songs, is_album=False)
+        # Play count ascending
+        self.refresh_list(self.library.sorted_songs("plays"), is_album=False)
 
     def export_data(self):
         f = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV File", "*.csv")])
@@ -396,6 +718,12 @@ class MusicifyApp(tk.Tk):
         self.main_paned.add(self.sidebar, minsize=150, width=260, stretch="never")
         
         tk.Label(self.sidebar, text="Musicify", bg=SIDEBAR_BG, fg=WHITE, font=("Segoe UI", 18, "bold")).pack(anchor="w", padx=35, pady=20)
+        # --- SEARCH ---
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(self.sidebar, textvariable=self.search_var, bg="#22303C", fg=WHITE, insertbackground="white", relief="flat", font=("Segoe UI", 10))
+        self.search_entry.pack(fill="x", padx=35, pady=(0, 15), ipady=5)
+        self.search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_var.trace_add("write", self.on_search_changed)
         self.btn_all = tk.Button(self.sidebar, text="All Songs", command=self.show_all_songs_view, bg=SIDEBAR_BG, fg=TEXT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35)
         self.btn_all.pack(fill="x", pady=5)
         self.btn_alb = tk.Button(self.sidebar, text="Albums", command=self.show_albums_view, bg=SIDEBAR_BG, fg=TEXT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35)
@@ -411,6 +739,14 @@ class MusicifyApp(tk.Tk):
         # Export Button
         tk.Button(self.sidebar, text="Export to Excel (CSV)", command=self.export_data, bg=SIDEBAR_BG, fg=ACCENT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, cursor="hand2", activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35).pack(fill="x", pady=10)
         tk.Button(self.sidebar, text="+ Add New Song", command=lambda: AddSongDialog(self), bg=SIDEBAR_BG, fg=ACCENT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35).pack(fill="x")
+        self.btn_scan = tk.Button(self.sidebar, text="+ Scan Music Folder", command=self.scan_folder, bg=SIDEBAR_BG, fg=ACCENT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35)
+        self.btn_scan.pack(fill="x", pady=(10, 0))
+        self.btn_fix = tk.Button(self.sidebar, text="Fix Song Durations", command=self.fix_durations, bg=SIDEBAR_BG, fg=ACCENT_COLOR, font=("Segoe UI", 11, "bold"), bd=0, activebackground=SIDEBAR_BG, activeforeground=WHITE, anchor="w", padx=35)
+        self.btn_fix.pack(fill="x", pady=(10, 0))
+        # Storage status, changes are saved in the background
+        self.save_status = None
+        self.lbl_save = tk.Label(self.sidebar, text="", bg=SIDEBAR_BG, fg="#6B7D8C", font=("Segoe UI", 9), anchor="w")
+        self.lbl_save.pack(side="bottom", fill="x", padx=35, pady=15)
 
         # Content
         self.content = tk.Frame(self.main_paned, bg=CONTENT_BG)
@@ -431,7 +767,7 @@ class MusicifyApp(tk.Tk):
         self.header_canvas.tag_bind(self.btn_shuf_id, "<Button-1>", lambda e: self.shuffle_current_view())
         
         # --- INIT LIST FIRST ---
-        self.list_container = ScrollableFrame(self.content, bg_color=CONTENT_BG)
+        self.list_container = VirtualList(self.content, bg_color=CONTENT_BG)
         self.list_container.pack(fill="both", expand=True, padx=30, pady=(0, 30))
         self.list_container.canvas.bind("<Configure>", self.on_content_resize)
         
@@ -444,7 +780,7 @@ class MusicifyApp(tk.Tk):
         self.queue_panel = tk.Frame(self.main_paned, bg=QUEUE_BG)
         self.main_paned.add(self.queue_panel, minsize=150, width=240, stretch="never")
         tk.Label(self.queue_panel, text="Up Next", bg=QUEUE_BG, fg="#6B7D8C", font=("Segoe UI", 12, "bold")).pack(anchor="w", padx=15, pady=20)
-        self.queue_container = ScrollableFrame(self.queue_panel, bg_color=QUEUE_BG)
+        self.queue_container = VirtualList(self.queue_panel, bg_color=QUEUE_BG, row_height=60)
         self.queue_container.pack(fill="both", expand=True, padx=0)
         tk.Button(self.queue_panel, text="Clear Queue", command=self.player.clear_queue, bg=QUEUE_BG, fg=TEXT_COLOR, bd=0, cursor="hand2", font=("Segoe UI", 9)).pack(pady=15)
         self.queue_panel.bind("<Configure>", self.on_queue_resize)
@@ -513,6 +849,20 @@ class MusicifyApp(tk.Tk):
                                   activebackground=PLAYER_BG, activeforeground=WHITE,
                                   selectcolor=PLAYER_BG, font=("Segoe UI", 9))
         chk_auto.pack(side="left", padx=(0, 15))
+        # Gapless: the next song starts the moment the current one ends (live albums)
+        chk_gapless = tk.Checkbutton(right, text="Gapless", variable=self.gapless_var,
+                                     command=lambda: setattr(self.player, "gapless", self.gapless_var.get()),
+                                     bg=PLAYER_BG, fg=TEXT_COLOR,
+                                     activebackground=PLAYER_BG, activeforeground=WHITE,
+                                     selectcolor=PLAYER_BG, font=("Segoe UI", 9))
+        chk_gapless.pack(side="left", padx=(0, 15))
+        # Crossfade: seconds the end of a song overlaps the next one's start (0 = off)
+        tk.Label(right, text="Crossfade", bg=PLAYER_BG, fg=TEXT_COLOR, font=("Segoe UI", 9)).pack(side="left", padx=(0, 4))
+        spn_fade = tk.Spinbox(right, from_=0, to=CROSSFADE_MAX, width=3, textvariable=self.crossfade_var, state="readonly",
+                              command=lambda: self.player.set_crossfade(self.crossfade_var.get()),
+                              bg=PLAYER_BG, fg=TEXT_COLOR, readonlybackground=PLAYER_BG,
+                              buttonbackground=PLAYER_BG, font=("Segoe UI", 9))
+        spn_fade.pack(side="left", padx=(0, 15))
         # -------------------------
 
         self.ico_vol = self.load_icon("assets/volume.png", (20, 20), bg_color=PLAYER_BG)
@@ -543,7 +893,142 @@ class MusicifyApp(tk.Tk):
 
     # --- LOGIC METHODS (Paste inside MusicifyApp class) ---
 
+    # --- LOADING ---
+    def start_loading(self):
+        """Streams the songs in a chunk per event loop turn, so the window is usable right away."""
+        if STORAGE == "sqlite":
+            print(self.store.migrate())
+            self.load_rows = self.store.read_songs()
+        elif os.path.exists(self.store.filename):
+            self.snapshot = open_snapshot(self.store.filename, self.library)
+            if self.snapshot:
+                # Already in the All Songs order: show all of it now, rows are built as they scroll into view
+                self.load_rows = self.snapshot.rows()
+                if self.sidebar_mode == "all" and self.view_mode == "list": self.refresh_list(self.snapshot, is_album=False)
+            else: self.load_rows = read_songs_file(self.store.filename)
+        else: self.load_rows = iter(())
+        # Nothing may be saved before the whole library is in, changes wait in early_changes
+        self.library.on_change = lambda *change: self.early_changes.append(change)
+        self.load_progress = 0.0
+        self.load_job = self.after(1, self._load_chunk)
+
+    def _load_chunk(self):
+        chunk = []
+        try: chunk = list(islice(self.load_rows, LOAD_CHUNK))
+        except Exception as e: print(f"Load Error: {e}") # Unreadable file: keep what we have
+        on_change, self.library.on_change = self.library.on_change, None
+        self.library.add_songs(args for _, args in chunk)
+        self.library.on_change = on_change
+        if len(chunk) == LOAD_CHUNK:
+            self.load_progress = chunk[-1][0]
+            # A snapshot is already showing in full, a partial list would only be a step back
+            if not self.snapshot and time.monotonic() - self.last_live_refresh > LOAD_REFRESH_MS / 1000: self._refresh_live_view()
+            self.load_job = self.after(1, self._load_chunk)
+        else: self.finish_loading()
+
+    def refresh_song_rows(self, songs=None):
+        """Shows in-place song changes in the visible list and Up Next rows (of songs, or all of them)."""
+        self.list_container.refresh_rows(songs)
+        self.queue_container.refresh_rows(songs)
+
+    def _refresh_live_view(self):
+        # Only the All Songs list fills in live (while loading or scanning), other views show what was there when they were opened
+        self.last_live_refresh = time.monotonic()
+        if self.sidebar_mode != "all" or self.view_mode != "list" or self.is_album_view: return
+        songs = self.library.get_sorted_song_list()
+        self.view_songs = songs
+        if tokenize(self.search_var.get()):
+            self.search_done = None
+            self.apply_search()
+        else:
+            self.current_view_songs = songs
+            self.list_container.update_items(songs, self.make_song_row, self.fill_song_row, self.release_song_row)
+
+    def finish_loading(self):
+        self.load_job = None
+        self.load_progress = None
+        self.library.on_change = None
+        if STORAGE != "sqlite": print(self.store.replay(self.library))
+        # Changes made during the load go on top of the journal (in order, so the replay can't
+        # bring back a song deleted meanwhile or drop one added meanwhile), then get saved like any other
+        for op, song, fields, title in self.early_changes:
+            if op == "update" and song.library is self.library: self.library.update_song(song, **fields)
+            elif op == "delete": self.library.delete_song(title)
+            elif op == "add" and song.library is not self.library:
+                self.library.delete_song(song.title)
+                self.library.insert_song(song)
+        self.store.attach(self.library)
+        for change in self.early_changes: self.store.record(*change)
+        self.early_changes = []
+        print(f"Loaded {len(self.library.all_songs)} songs{' from the snapshot' if self.snapshot else ''}.")
+        # No (valid) snapshot yet: write one, so the next start can skip parsing
+        if STORAGE != "sqlite" and not self.snapshot and self.library.all_songs: self.store.compact(snapshot=True)
+        self.snapshot = None
+        # gc.freeze() is process-wide: everything alive now (the library, but also Tk, pygame and
+        # the rest of the app) leaves the cycle collector's reach for good, so it's done only
+        # here, once per run. Without it every full collection walks the whole song graph
+        # again, and searches got about 10x slower at 100k songs. Later songs are collected as usual.
+        if not gc.get_freeze_count():
+            gc.collect()
+            gc.freeze()
+        self._refresh_live_view()
+        # Build any missing album art thumbnails in the background
+        thumb_store.warm([s.image_path for s in self.library.all_songs.values()], render_round_image)
+
+    # --- FOLDER SCAN ---
+    def scan_folder(self):
+        """Adds every song in a music folder (and its subfolders), or cancels the running scan."""
+        if self.scanner.running:
+            self.scanner.cancel()
+            return
+        if self.load_job or self.duration_fixer.running:
+            messagebox.showinfo("Scan Music Folder", "Please wait until the library has finished loading and checking durations.")
+            return
+        folder = filedialog.askdirectory(title="Choose a music folder (choose it again later to pick up changes)",
+                                         initialdir=self.scan_folder_path)
+        if not folder or not self.scanner.start(folder): return
+        self.scan_folder_path = folder
+        self.scan_text = "Scanning..."
+        self.btn_scan.config(text="Cancel Scan")
+
+    def on_scan_progress(self, checked, probed, to_probe):
+        self.scan_text = f"Scanning... {checked} files" + (f", read {probed}/{to_probe}" if to_probe else "")
+        if probed and time.monotonic() - self.last_live_refresh > LOAD_REFRESH_MS / 1000:
+            self._refresh_live_view()
+            self.refresh_song_rows() # Rescanned songs get their new tags in place
+
+    def on_scan_done(self, added, cancelled):
+        self.scan_text = None
+        self.btn_scan.config(text="+ Scan Music Folder")
+        print(f"Scan {'cancelled' if cancelled else 'finished'}: {self.scanner.summary()}.")
+        self._refresh_live_view()
+        self.refresh_song_rows()
+
+    def fix_durations(self):
+        """Re-reads every song's length from its file and corrects the wrong ones, or cancels that."""
+        if self.duration_fixer.running:
+            self.duration_fixer.cancel()
+            return
+        if self.load_job or self.scanner.running:
+            messagebox.showinfo("Fix Song Durations", "Please wait until the library has finished loading and scanning.")
+            return
+        if not self.duration_fixer.start(list(self.library.all_songs.values())): return
+        self.scan_text = "Checking durations..."
+        self.btn_fix.config(text="Cancel Fixing Durations")
+
+    def on_fix_progress(self, checked, total):
+        self.scan_text = f"Checking durations... {checked}/{total}"
+
+    def on_fix_done(self, fixed, cancelled):
+        self.scan_text = None
+        self.btn_fix.config(text="Fix Song Durations")
+        print(f"Fix durations {'cancelled' if cancelled else 'finished'}: {fixed} songs corrected.")
+        if fixed:
+            self._refresh_live_view()
+            self.refresh_song_rows() # The durations changed in place
+
     def set_sidebar_active(self, mode):
+        self.sidebar_mode = mode
         # Reset all
         self.btn_all.config(fg=TEXT_COLOR)
         self.btn_alb.config(fg=TEXT_COLOR)
@@ -564,53 +1049,10 @@ class MusicifyApp(tk.Tk):
         self.refresh_list(self.library.get_sorted_song_list(), is_album=False)
         self.update_play_icon(self.player.is_playing)
 
-    def show_albums_view(self):
-        self.header_canvas.itemconfig(self.title_text_id, text="Albums")
-        self.header_canvas.itemconfigure("controls", state="hidden")
-        self.set_sidebar_active("albums")
-        self.sticky_header.pack_forget()
-        
-        frame = self.list_container.scrollable_frame
-        for w in frame.winfo_children(): w.destroy()
-        self.view_mode = "album_grid"
-        self.album_cards = []
-        self.is_album_view = False 
-        self.last_cols = 0 
-        
-        # GRID RESET (Fixes spacing issue)
-        for c in range(20): frame.grid_columnconfigure(c, weight=0, minsize=0, uniform="")
-
-        albums = self.library.get_songs_by_album()
-        for i, album in enumerate(albums):
-            card = tk.Frame(frame, bg=SIDEBAR_BG, width=ALBUM_CARD_WIDTH, height=ALBUM_CARD_HEIGHT)
-            card.pack_propagate(False)
-            def on_c_ent(e, c=card): c.config(bg=HOVER_COLOR)
-            def on_c_lve(e, c=card): c.config(bg=SIDEBAR_BG)
-            card.bind("<Enter>", on_c_ent); card.bind("<Leave>", on_c_lve)
-            songs = albums[album]
-            if songs and songs[0].image_path:
-                icon = self.load_icon(songs[0].image_path, (160, 160), rounded=True, bg_color=SIDEBAR_BG)
-                if icon:
-                    self.image_refs[f"alb{i}"] = icon
-                    btn = tk.Button(card, image=icon, bg=SIDEBAR_BG, bd=0, activebackground=SIDEBAR_BG, command=lambda a=album: self.open_album(a))
-                    btn.pack(pady=15)
-                    btn.bind("<Enter>", lambda e, c=card: c.config(bg=HOVER_COLOR))
-                    btn.bind("<Leave>", lambda e, c=card: c.config(bg=SIDEBAR_BG))
-            lbl = tk.Label(card, text=album, bg=SIDEBAR_BG, fg=WHITE, font=("Segoe UI", 10, "bold"), wraplength=160, justify="left")
-            lbl.pack(anchor="w", padx=10)
-            lbl.bind("<Enter>", lambda e, c=card: c.config(bg=HOVER_COLOR))
-            artist_name = songs[0].artist if songs else "Unknown"
-            lbl2 = tk.Label(card, text=artist_name, bg=SIDEBAR_BG, fg=TEXT_COLOR, font=("Segoe UI", 9), wraplength=160, justify="left")
-            lbl2.pack(anchor="w", padx=10)
-            lbl2.bind("<Enter>", lambda e, c=card: c.config(bg=HOVER_COLOR))
-            self.album_cards.append(card)
-        self.on_content_resize(None)
-        self.header_canvas.itemconfig(self.btn_play_id, image=self.icon_play_big)
-
     def open_album(self, album_name):
         self.header_canvas.itemconfig(self.title_text_id, text=album_name)
         self.header_canvas.itemconfigure("controls", state="normal")
-        self.refresh_list(self.library.get_songs_by_album()[album_name], is_album=True)
+        self.refresh_list(self.library.get_album_songs(album_name), is_album=True)
         self.update_play_icon(self.player.is_playing)
 
     def play_current_view(self):
@@ -635,22 +1077,23 @@ class MusicifyApp(tk.Tk):
             self.player.play_list(shuffled)
 
     def sort_by(self, key):
-        # Sort the current list based on the key
-        if key == "title":
-            self.current_view_songs.sort(key=lambda s: s.title.lower())
-        elif key == "album":
-            self.current_view_songs.sort(key=lambda s: s.album.lower())
-        elif key == "duration":
-            self.current_view_songs.sort(key=lambda s: s.duration, reverse=True) # Longest first
+        # Sort the current list based on the key (the search box filter is applied again afterwards)
+        reverse = key in ("duration", "plays") # Longest / most played first
+        if len(self.view_songs) == len(self.library.all_songs):
+            # Whole library: the order is already maintained by the library's index
+            songs = self.library.sorted_songs(key, reverse=reverse)
+        else:
+            songs = sorted(self.view_songs, key=SORT_KEYS[key], reverse=reverse)
             
         # Refresh the screen
-        self.refresh_list(self.current_view_songs, is_album=self.is_album_view)
+        self.refresh_list(songs, is_album=self.is_album_view)
 
     def refresh_list(self, songs, is_album=False):
         self.view_mode = "list"
         self.album_cards = []
         self.is_album_view = is_album 
-        self.current_view_songs = songs
+        self.view_songs = songs
+        self.search_done = None
         
         # 1. Clean up header
         for w in self.sticky_header.winfo_children(): w.destroy()
@@ -692,75 +1135,98 @@ class MusicifyApp(tk.Tk):
         else:
             self.sticky_header.pack_forget()
 
-        # 3. Get the frame variable (This was the missing part causing the NameError)
-        frame = self.list_container.scrollable_frame
-        for w in frame.winfo_children(): w.destroy()
-        
-        # 4. Configure columns
-        if is_album:
-            for c in range(6): frame.grid_columnconfigure(c, weight=0, minsize=0)
+        # 3. Filter by the search box (if anything is typed) and show the result
+        self.art_loader.cancel_group("albums")
+        self.apply_search()
+
+    def show_songs(self, songs):
+        """Hands the songs to the virtual list, rows are only built for the visible window."""
+        self.current_view_songs = songs
+        self.art_loader.cancel_group("list")
+        self.list_container.set_items(songs, self.make_song_row, self.fill_song_row, self.release_song_row)
+        self.on_content_resize(None)
+
+    # --- SEARCH ---
+    def on_search_changed(self, *args):
+        # Every keystroke just restarts the timer, the list is filtered once typing pauses
+        if self.search_timer: self.after_cancel(self.search_timer)
+        self.search_timer = self.after(SEARCH_DELAY_MS, self.apply_search)
+
+    def apply_search(self):
+        """
+        Searches the current list view with the search box. The whole library (All Songs) gets the
+        ranked search, best match first; other views are filtered in their order (every word has to
+        start a word of the song). Either way, when nothing matches, misspelled words are tried.
+        """
+        if self.search_timer: self.after_cancel(self.search_timer)
+        self.search_timer = None
+        self.cancel_search_job()
+        if self.view_mode != "list": return
+
+        query = self.search_var.get()
+        terms = tokenize(query)
+        done = self.search_done
+        if not terms:
+            if done is not None or self.current_view_songs is not self.view_songs: self.finish_search(None, self.view_songs)
+            return
+        if done and terms == done[0]: return # e.g. only a space was added
+
+        if len(self.view_songs) == len(self.library.all_songs):
+            # Parts of words count too, so a longer query can't simply refine the last result
+            self.finish_search(terms, self.library.search(query, limit=SEARCH_RESULTS), refinable=False)
+        elif done and all(any(t.startswith(old) for t in terms) for old in done[0]):
+            # The query only got longer, so the new result is part of the last one: refine that
+            self._filter_chunk(query, terms, done[1], [], 0)
+        else:
+            self.finish_search(terms, self.library.filter_songs(self.view_songs, query))
+
+    def _filter_chunk(self, query, terms, source, found, start):
+        # Big refinements run a slice per event loop turn, so typing stays smooth and newer queries can cancel them
+        end = start + FILTER_SCAN_LIMIT
+        found += self.library.filter_songs(source[start:end], query)
+        if end < len(source):
+            self.search_job = self.after(1, self._filter_chunk, query, terms, source, found, end)
         else:
-            self._configure_grid_columns(frame)
-
-        # 5. Loop through songs
-        for i, song in enumerate(songs):
-            r = i
-            list_idx = i
-            cmd = lambda e, idx=list_idx: self.play_song_from_view(idx)
-            r_click = lambda e, s=song: self.show_context_menu(e, s)
-            def on_ent(e, r=r):
-                for w in frame.grid_slaves(row=r): w.config(bg=HOVER_COLOR)
-            def on_lve(e, r=r):
-                for w in frame.grid_slaves(row=r): w.config(bg=CONTENT_BG)
-
-            # --- ALBUM ART LOGIC ---
-            if is_album:
-                l = tk.Label(frame, text=str(song.track_number), bg=CONTENT_BG, fg=TEXT_COLOR)
-                l.grid(row=r, column=0, sticky="w", pady=8, padx=(15,0))
-                l.bind("<Enter>", on_ent); l.bind("<Leave>", on_lve); l.bind("<Button-3>", r_click)
+            self.search_job = None
+            self.finish_search(terms, found)
+
+    def cancel_search_job(self):
+        if self.search_job: self.after_cancel(self.search_job)
+        self.search_job = None
+
+    def finish_search(self, terms, songs, refinable=True):
+        if terms and not songs:
+            # Nothing found: maybe a word is misspelled ("metalica")
+            if len(self.view_songs) == len(self.library.all_songs):
+                songs = self.library.search(" ".join(terms), limit=SEARCH_RESULTS, fuzzy=True)
             else:
-                art_cont = tk.Frame(frame, width=60, height=48, bg=CONTENT_BG, bd=0, highlightthickness=0)
-                art_cont.pack_propagate(False)
-                art_cont.grid(row=r, column=0, sticky="w", pady=5, padx=(10,0))
-                art_cont.bind("<Button-1>", cmd); art_cont.bind("<Enter>", on_ent); art_cont.bind("<Leave>", on_lve); art_cont.bind("<Button-3>", r_click)
-                
-                icon = self.load_icon(song.image_path, (48, 48), rounded=True)
-                if icon:
-                    self.image_refs[f"s{i}"] = icon
-                    lbl = tk.Label(art_cont, image=icon, bg=CONTENT_BG, bd=0)
-                    lbl.pack(expand=True)
-                    lbl.bind("<Button-1>", cmd); lbl.bind("<Enter>", on_ent); lbl.bind("<Leave>", on_lve); lbl.bind("<Button-3>", r_click)
-                else:
-                    ph = make_round_image(None, (48,48))
-                    self.image_refs[f"s{i}_ph"] = ph
-                    lbl = tk.Label(art_cont, image=ph, bg=CONTENT_BG, bd=0)
-                    lbl.pack(expand=True)
-                    lbl.bind("<Button-1>", cmd); lbl.bind("<Enter>", on_ent); lbl.bind("<Leave>", on_lve); lbl.bind("<Button-3>", r_click)
-
-            # Metadata
-            meta = tk.Frame(frame, bg=CONTENT_BG)
-            meta.grid(row=r, column=1, sticky="we", padx=(10, 5))
-            t = tk.Label(meta, text=song.title, bg=CONTENT_BG, fg=WHITE, font=("Segoe UI", 10), anchor="w")
-            t.pack(fill="x")
-            a = tk.Label(meta, text=song.artist, bg=CONTENT_BG, fg=TEXT_COLOR, font=("Segoe UI", 9), anchor="w")
-            a.pack(fill="x")
-            for w in [meta, t, a]: w.bind("<Button-1>", cmd); w.bind("<Enter>", on_ent); w.bind("<Leave>", on_lve); w.bind("<Button-3>", r_click)
-
-            l2 = tk.Label(frame, text=song.album, bg=CONTENT_BG, fg=TEXT_COLOR, anchor="w")
-            l2.grid(row=r, column=2, sticky="we")
-            l2.bind("<Enter>", on_ent); l2.bind("<Leave>", on_lve); l2.bind("<Button-3>", r_click)
-
-            # Play Count
-            l_plays = tk.Label(frame, text=f"{song.play_count} plays", bg=CONTENT_BG, fg="#6B7D8C", font=("Segoe UI", 9), anchor="e")
-            l_plays.grid(row=r, column=3, sticky="e")
-            l_plays.bind("<Enter>", on_ent); l_plays.bind("<Leave>", on_lve); l_plays.bind("<Button-3>", r_click)
-
-            # Duration
-            l3 = tk.Label(frame, text=_format_duration(song.duration), bg=CONTENT_BG, fg=TEXT_COLOR, anchor="e")
-            l3.grid(row=r, column=4, sticky="e", padx=(0,10))
-            l3.bind("<Enter>", on_ent); l3.bind("<Leave>", on_lve); l3.bind("<Button-3>", r_click)
+                in_view = set(self.view_songs)
+                songs = [s for s in self.library.search(" ".join(terms), fuzzy=True) if s in in_view]
+            refinable = False
+        self.search_done = (terms, songs) if terms and refinable else None
+        self.show_songs(songs)
+
+    def make_song_row(self, parent):
+        row = SongRow(parent, on_play=self.play_song_from_view, on_menu=self.show_context_menu)
+        row.set_columns(*self.list_col_widths)
+        return row
+
+    def fill_song_row(self, row, index, song):
+        self.art_loader.cancel(row.art_ticket)
+        row.art_ticket = None
+        if self.is_album_view:
+            row.bind_song(index, song, True)
+            self._fit_song_row(row)
+            return
+        # Show the transparent placeholder now, the real art arrives from the loader
+        row.bind_song(index, song, False, make_round_image(None, (48, 48)))
+        self._fit_song_row(row)
+        if song.image_path:
+            row.art_ticket = self.art_loader.load(song.image_path, (48, 48), 10, row.set_art, group="list")
 
-        self.on_content_resize(None)
+    def release_song_row(self, row):
+        self.art_loader.cancel(row.art_ticket)
+        row.art_ticket = None
 
     def play_song_from_view(self, index):
         if 0 <= index < len(self.current_view_songs):
@@ -771,13 +1237,12 @@ class MusicifyApp(tk.Tk):
                 tk.messagebox.showerror("Error", f"File not found:\n{song.filepath}")
                 return
 
-            self.player.play_now(song)
-            self.player.clear_queue()
-            
             # --- Autoplay Logic ---
+            # The rest of the view goes in as one batch, so "Up Next" is rebuilt once
             if self.autoplay_var.get():
-                remaining = self.current_view_songs[index+1:]
-                for s in remaining: self.player.add_to_queue(s)
+                self.player.play_list(self.current_view_songs, start_index=index)
+            else:
+                self.player.play_now(song)
 
     def edit_song_details(self, song):
         # Create a popup window
@@ -811,22 +1276,15 @@ class MusicifyApp(tk.Tk):
 
             if not new_title: return
 
-            # Because the library uses Title as the unique key, we must:
-            # 1. Delete the old entry (if title changed, or just to be safe)
-            self.library.delete_song(song.title)
-            
-            # 2. Add as a "new" song with updated details (keeping track #, duration, path)
-            self.library.add_song(
-                new_title, new_artist, new_album, 
-                song.track_number, song.duration, new_genre, 
-                song.filepath, song.image_path
-            )
-            
-            save_songs_to_file(self.library)
+            # Edited in place (likes and play count stay), the library re-keys a changed title
+            if not self.library.update_song(song, title=new_title, artist=new_artist, album=new_album, genre=new_genre):
+                messagebox.showerror("Edit Song", f"There already is a song called '{new_title}'.")
+                return
             
             # Refresh UI
             if self.view_mode == "list": self.show_all_songs_view()
             else: self.show_albums_view()
+            self.refresh_song_rows([song]) # It may be in Up Next too
             
             edit_win.destroy()
 
@@ -837,7 +1295,6 @@ class MusicifyApp(tk.Tk):
         # Use the library's existing delete logic
         if self.library.delete_song(song.title):
             print(f"Deleted: {song.title}")
-            save_songs_to_file(self.library)
             
             # Refresh the correct view
             if self.view_mode == "list":
@@ -846,12 +1303,12 @@ class MusicifyApp(tk.Tk):
                 self.show_albums_view()
 
     def toggle_like_song(self, song):
-        song.is_liked = not song.is_liked
-        save_songs_to_file(self.library)
+        self.library.update_song(song, is_liked=not song.is_liked)
         
         current_title = self.header_canvas.itemcget(self.title_text_id, "text")
         if current_title == "Liked Songs":
             self.show_liked_songs_view()
+        else: self.refresh_song_rows([song])
 
     def show_context_menu(self, event, song):
         menu = tk.Menu(self, tearoff=0, bg=PLAYER_BG, fg=WHITE, activebackground=HOVER_COLOR)
@@ -873,8 +1330,10 @@ class MusicifyApp(tk.Tk):
         self.set_sidebar_active("albums")
         self.sticky_header.pack_forget()
         
+        self.art_loader.cancel_group("list")
+        self.art_loader.cancel_group("albums")
+        self.list_container.clear()
         frame = self.list_container.scrollable_frame
-        for w in frame.winfo_children(): w.destroy()
         
         self.view_mode = "album_grid"
         self.album_cards = []
@@ -898,14 +1357,16 @@ class MusicifyApp(tk.Tk):
             
             songs = albums[album]
             if songs and songs[0].image_path:
-                # Load with background color to fix white corners
-                icon = self.load_icon(songs[0].image_path, (160, 160), rounded=True, bg_color=SIDEBAR_BG)
-                if icon:
-                    self.image_refs[f"alb{i}"] = icon
-                    btn = tk.Button(card, image=icon, bg=SIDEBAR_BG, bd=0, activebackground=SIDEBAR_BG, command=lambda a=album: self.open_album(a))
-                    btn.pack(pady=15)
-                    btn.bind("<Enter>", lambda e, c=card: c.config(bg=HOVER_COLOR))
-                    btn.bind("<Leave>", lambda e, c=card: c.config(bg=SIDEBAR_BG))
+                # Transparent placeholder first, the cover is swapped in once it's decoded
+                icon = make_round_image(None, (160, 160), radius=10)
+                btn = tk.Button(card, image=icon, bg=SIDEBAR_BG, bd=0, activebackground=SIDEBAR_BG, command=lambda a=album: self.open_album(a))
+                btn.image = icon
+                btn.pack(pady=15)
+                btn.bind("<Enter>", lambda e, c=card: c.config(bg=HOVER_COLOR))
+                btn.bind("<Leave>", lambda e, c=card: c.config(bg=SIDEBAR_BG))
+                def set_cover(photo, b=btn):
+                    b.config(image=photo); b.image = photo
+                self.art_loader.load(songs[0].image_path, (160, 160), 10, set_cover, group="albums")
             
             lbl = tk.Label(card, text=album, bg=SIDEBAR_BG, fg=WHITE, font=("Segoe UI", 10, "bold"), wraplength=160, justify="left")
             lbl.pack(anchor="w", padx=10)
@@ -943,13 +1404,12 @@ class MusicifyApp(tk.Tk):
             self.sticky_header.grid_columnconfigure(4, minsize=COL_DUR_WIDTH, weight=0)
             self.sticky_header.grid_columnconfigure(5, minsize=SCROLLBAR_WIDTH, weight=0)
 
-            # Apply to Song List
-            f = self.list_container.scrollable_frame
-            f.grid_columnconfigure(0, minsize=COL_ART_WIDTH, weight=0)
-            f.grid_columnconfigure(1, minsize=w_title, weight=0)
-            f.grid_columnconfigure(2, minsize=w_album, weight=0)
-            f.grid_columnconfigure(3, minsize=COL_PLAYS_WIDTH, weight=0)
-            f.grid_columnconfigure(4, minsize=COL_DUR_WIDTH, weight=0)
+            # Apply to Song List (only the pooled rows exist)
+            if self.list_col_widths != (w_title, w_album):
+                self.list_col_widths = (w_title, w_album)
+                for row in self.list_container.rows: row.set_columns(w_title, w_album)
+                for row in self.list_container.visible.values(): self._fit_song_row(row)
+            self.list_container.set_width(width)
             return
 
         # Album Grid Logic (Keeps existing logic for albums)
@@ -968,19 +1428,24 @@ class MusicifyApp(tk.Tk):
         self.resize_timer = self.after(50, lambda: self._update_queue_text(event.width))
 
     def _update_queue_text(self, width):
-        char_limit = max(10, (width - 60) // 8)
-        for lbl, full_text in self.queue_labels:
-            f = self.font_title if lbl.cget("font") == "Segoe UI 9 bold" else self.font_artist
-            if f.measure(full_text) <= (width - 60):
-                lbl.config(text=full_text)
-            else:
-                t = full_text
-                while f.measure(t + "...") > (width - 60) and len(t) > 0:
-                    t = t[:-1]
-                lbl.config(text=t + "...")
+        # Only the rows on screen exist, recycled rows are fitted again when they're filled
+        for row in self.queue_container.visible.values(): self._fit_queue_row(row, width)
+
+    def _fit_queue_row(self, row, width):
+        row.lbl_title.config(text=text_fitter.fit(row.song.title, self.font_title, width - 60))
+        row.lbl_artist.config(text=text_fitter.fit(row.song.artist, self.font_artist, width - 60))
+
+    def _fit_song_row(self, row):
+        w_title, w_album = self.list_col_widths
+        if not w_title: return
+        song = row.song
+        row.lbl_title.config(text=text_fitter.fit(song.title, self.font_row_title, w_title - 15))
+        row.lbl_artist.config(text=text_fitter.fit(song.artist, self.font_row_artist, w_title - 15))
+        row.lbl_album.config(text=text_fitter.fit(song.album, self.font_row_album, w_album - 10))
 
     def update_now_playing_ui(self, song):
         if song:
+            self.refresh_song_rows([song]) # Its play count went up
             self.lbl_mini_title.config(text=song.title)
             self.lbl_mini_artist.config(text=song.artist)
             self.lbl_tot.config(text=_format_duration(song.duration))
@@ -988,52 +1453,30 @@ class MusicifyApp(tk.Tk):
             self.btn_play.config(image=self.ico_pause)
             
             if song.image_path:
-                # FIX: Pass PLAYER_BG so corners blend with the bottom bar, not the list
-                icon = self.load_icon(song.image_path, (100, 100), rounded=True, bg_color=PLAYER_BG)
-                if icon: 
-                    self.image_refs["mini"] = icon
-                    self.lbl_mini_art.config(image=icon)
+                # Decoded in the background, an older request for the previous song is dropped
+                self.art_loader.cancel_group("mini")
+                self.art_loader.load(song.image_path, (100, 100), 10, self.set_mini_art, group="mini")
         else:
             self.btn_play.config(image=self.ico_play)
 
+    def set_mini_art(self, icon):
+        self.image_refs["mini"] = icon
+        self.lbl_mini_art.config(image=icon)
+
     def update_queue_ui(self, queue):
-        frame = self.queue_container.scrollable_frame
-        for w in frame.winfo_children(): w.destroy()
-        self.queue_labels = []
-        
-        for i, song in enumerate(queue):
-            row = tk.Frame(frame, bg=QUEUE_BG, height=60)
-            row.pack(fill="x", pady=0)
-            row.pack_propagate(False)
-            
-            def on_click(e, idx=i): self.player.skip_to_index(idx)
-            def on_ent(e, r=row): r.config(bg=HOVER_COLOR)
-            def on_lve(e, r=row): r.config(bg=QUEUE_BG)
+        # Diff against what's on screen: rows whose song is still visible are only
+        # moved and renumbered, so popping the head song doesn't rebuild anything
+        self.queue_container.update_items(queue, self.make_queue_row, self.fill_queue_row, relabel_row=self.relabel_queue_row)
 
-            row.bind("<Double-Button-1>", on_click)
-            row.bind("<Enter>", on_ent)
-            row.bind("<Leave>", on_lve)
+    def make_queue_row(self, parent):
+        return QueueRow(parent, on_play=self.player.skip_to_index)
 
-            lbl_num = tk.Label(row, text=str(i+1), bg=QUEUE_BG, fg=TEXT_COLOR, width=4)
-            lbl_num.pack(side="left")
-            
-            info = tk.Frame(row, bg=QUEUE_BG)
-            info.pack(side="left", fill="x", expand=True, padx=(0, 10))
-            
-            lbl_title = tk.Label(info, text=song.title, bg=QUEUE_BG, fg=WHITE, font=("Segoe UI", 9, "bold"), anchor="w")
-            lbl_title.pack(fill="x")
-            self.queue_labels.append((lbl_title, song.title))
-            
-            lbl_artist = tk.Label(info, text=song.artist, bg=QUEUE_BG, fg=TEXT_COLOR, font=("Segoe UI", 8), anchor="w")
-            lbl_artist.pack(fill="x")
-            self.queue_labels.append((lbl_artist, song.artist))
-
-            for w in (lbl_num, info, lbl_title, lbl_artist):
-                w.bind("<Double-Button-1>", on_click)
-                w.bind("<Enter>", on_ent)
-                w.bind("<Leave>", on_lve)
-        
-        self._update_queue_text(self.queue_panel.winfo_width())
+    def fill_queue_row(self, row, index, song):
+        row.bind_song(index, song)
+        self._fit_queue_row(row, self.queue_panel.winfo_width())
+
+    def relabel_queue_row(self, row, index):
+        row.set_index(index)
 
     def update_play_icon(self, is_playing):
         self.btn_play.config(image=self.ico_pause if is_playing else self.ico_play)
@@ -1043,20 +1486,58 @@ class MusicifyApp(tk.Tk):
         else:
             self.header_canvas.itemconfig(self.btn_play_id, image=self.icon_play_big)
 
+    def on_playback_state(self, is_playing):
+        self.update_play_icon(is_playing)
+        if is_playing:
+            if not self.pump_job: self.pump_job = self.after(PUMP_MS, self.pump_player)
+            self.wake_progress()
+
+    def pump_player(self):
+        self.player.pump_events()
+        self.pump_job = self.after(PUMP_MS, self.pump_player) if self.player.is_playing else None
+
+    def wake_progress(self):
+        if not self.progress_job: self.progress_job = self.after(FRAME_MS, self.update_progress)
+
     def update_progress(self):
-        self.player.check_music_status()
-        if self.player.is_playing:
-            cur = self.player.get_current_position()
+        # Nothing to show while paused, stopped or minimized: stop until on_playback_state()/<Map> wakes it
+        self.progress_job = None
+        if not self.player.is_playing or not self.winfo_viewable(): return
+        cur = self.player.get_current_position()
+        duration = self.player.current_song.duration if self.player.current_song else 0
+        # Only touch the widgets when the bar moved a pixel or the time changed
+        shown = (int(cur / duration * self.slider.width) if duration else 0, _format_duration(cur))
+        if shown != self.progress_shown:
+            self.progress_shown = shown
             self.slider.set_value(cur)
-            self.lbl_cur.config(text=_format_duration(cur))
-        self.after(500, self.update_progress)
+            self.lbl_cur.config(text=shown[1])
+        self.progress_job = self.after(FRAME_MS, self.update_progress)
+
+    def update_save_status(self):
+        status = self.store.status
+        if self.load_progress is not None: status = f"Loading songs... {self.load_progress:.0%}"
+        elif self.scan_text: status = self.scan_text
+        if status != self.save_status:
+            self.save_status = status
+            self.lbl_save.config(text=SAVE_STATUS_TEXT.get(status, status), fg="#E07A5F" if status == "error" else "#6B7D8C")
+        self.after(250, self.update_save_status)
 
     def on_seek(self, val):
         self.player.seek(float(val))
 
     def on_close(self):
         print("Auto-saving on exit...")
-        print(save_songs_to_file(self.library))
+        self.scanner.cancel()
+        self.duration_fixer.cancel()
+        if self.load_job:
+            # Closed before everything was loaded: leave the files as they are, only add the changes
+            self.after_cancel(self.load_job)
+            for change in self.early_changes: self.store.record(*change)
+            print("Saved." if self.store.flush() else "Error: not everything could be saved.")
+        else: print(self.store.close())
+        print(art_cache.stats())
+        self.art_loader.shutdown()
+        self.player.shutdown()
         self.destroy()
 
 if __name__ == "__main__":
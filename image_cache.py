@@ -0,0 +1,116 @@
+import os
+from collections import OrderedDict
+from PIL import Image, ImageTk, ImageDraw, ImageOps
+from thumbnail_store import thumb_store
+
+# Default budget for cached art, counted in pixels (~4 bytes each once Tk has them)
+MAX_CACHE_PIXELS = 8_000_000
+
+# Rounded masks only depend on (size, radius), so every image of that shape shares one
+_mask_cache = {}
+
+def get_round_mask(size, radius):
+    """Returns the anti-aliased rounded-corner mask for (size, radius), drawing it only once."""
+    key = (tuple(size), radius)
+    mask = _mask_cache.get(key)
+    if mask is None:
+        # Super-sampling for smooth edges (4x size)
+        ss_size = (size[0] * 4, size[1] * 4)
+        ss_radius = radius * 4
+
+        # Mask: White = Visible, Black = Transparent
+        mask = Image.new("L", ss_size, 0)
+        draw = ImageDraw.Draw(mask)
+        draw.rounded_rectangle((0, 0) + ss_size, radius=ss_radius, fill=255)
+        mask = mask.resize(size, Image.Resampling.LANCZOS)
+        _mask_cache[key] = mask
+    return mask
+
+def render_round_image(image_path, size, radius=0):
+    """
+    Loads image, crops to fill square, and applies a TRANSPARENT rounded mask.
+    Pure PIL work (no Tk), returns an RGBA Image.
+    """
+    # 1. Load or Create Placeholder
+    if image_path and os.path.exists(image_path):
+        with Image.open(image_path) as src:
+            img = ImageOps.fit(src.convert("RGBA"), size, method=Image.Resampling.LANCZOS)
+    else:
+        # Transparent placeholder if missing (Invisible)
+        img = Image.new('RGBA', size, (0, 0, 0, 0))
+
+    # 2. Apply Rounded Corners (Alpha Masking)
+    if radius > 0:
+        img.putalpha(get_round_mask(size, radius))
+    return img
+
+def load_round_image(image_path, size, radius=0):
+    """Same as render_round_image, but reads/writes the on-disk thumbnail store first."""
+    if not image_path: return render_round_image(None, size, radius)
+    img = thumb_store.load(image_path, size, radius)
+    if img is None:
+        img = render_round_image(image_path, size, radius)
+        if os.path.exists(image_path): thumb_store.save(image_path, size, radius, img)
+    return img
+
+def art_cache_key(image_path, size, radius=0):
+    """(path, size, radius, mtime) - a changed file on disk gets a new key."""
+    try: mtime = os.path.getmtime(image_path) if image_path else None
+    except OSError: mtime = None
+    return (image_path if mtime is not None else None, tuple(size), radius, mtime)
+
+class ImageCache:
+    """
+    LRU cache of ready-to-use PhotoImages, evicted by total pixel count
+    instead of entry count so a few big album covers can't blow up memory.
+    """
+    def __init__(self, max_pixels=MAX_CACHE_PIXELS):
+        self.max_pixels = max_pixels
+        self.entries = OrderedDict() # key -> (photo, pixels)
+        self.total_pixels = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, photo, pixels):
+        if key in self.entries:
+            self.total_pixels -= self.entries.pop(key)[1]
+        self.entries[key] = (photo, pixels)
+        self.total_pixels += pixels
+        # Oldest first, but never evict the entry we just added
+        while self.total_pixels > self.max_pixels and len(self.entries) > 1:
+            _, (_, old_pixels) = self.entries.popitem(last=False)
+            self.total_pixels -= old_pixels
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.total_pixels = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return (f"Art cache: {len(self.entries)} images, {self.total_pixels} px, "
+                f"hit rate {self.hit_rate():.0%} ({self.hits} hits / {self.misses} misses, {self.evictions} evicted)")
+
+art_cache = ImageCache()
+
+def get_round_photo(image_path, size, radius=0, cache=art_cache):
+    """Cached version of render_round_image that returns a Tk PhotoImage."""
+    key = art_cache_key(image_path, size, radius)
+    photo = cache.get(key)
+    if photo is None:
+        photo = ImageTk.PhotoImage(load_round_image(key[0], size, radius))
+        cache.put(key, photo, size[0] * size[1])
+    return photo
@@ -0,0 +1,94 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ImageTk
+
+from image_cache import art_cache, art_cache_key, load_round_image
+
+class ImageTicket:
+    """Handle for one pending image request. cancel() it when the row/view goes away."""
+    def __init__(self, key, callback, group):
+        self.key = key
+        self.callback = callback
+        self.group = group
+        self.cancelled = False
+
+class ImageLoader:
+    """
+    Decodes album art on a thread pool so the Tk main thread never waits for PIL.
+    Workers only produce PIL Images; the PhotoImage is created back on the main
+    thread by a short after() pump, which then calls the request's callback.
+    Requests for the same (path, size, radius) share one decode.
+    """
+    def __init__(self, root, workers=4, cache=art_cache):
+        self.root = root
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="art")
+        self.results = queue.Queue()
+        self.pending = {} # key -> (future, [tickets])
+        self.pump_id = None
+
+    def load(self, image_path, size, radius, callback, group=None):
+        """
+        Calls callback(photo) right away if the image is already cached,
+        otherwise queues the decode and returns a ticket (None when nothing is pending).
+        """
+        key = art_cache_key(image_path, size, radius)
+        photo = self.cache.get(key)
+        if photo is not None:
+            callback(photo)
+            return None
+
+        ticket = ImageTicket(key, callback, group)
+        if key in self.pending:
+            self.pending[key][1].append(ticket)
+        else:
+            future = self.pool.submit(self._work, key)
+            self.pending[key] = (future, [ticket])
+        self._schedule_pump()
+        return ticket
+
+    def cancel(self, ticket):
+        if ticket is None or ticket.cancelled: return
+        ticket.cancelled = True
+        entry = self.pending.get(ticket.key)
+        # Nobody else wants this image: drop the decode if it hasn't started yet
+        if entry and all(t.cancelled for t in entry[1]):
+            if entry[0].cancel(): del self.pending[ticket.key]
+
+    def cancel_group(self, group):
+        """Cancels every pending request of a view that was replaced."""
+        for _, tickets in list(self.pending.values()):
+            for t in tickets:
+                if t.group == group: self.cancel(t)
+
+    def shutdown(self):
+        if self.pump_id: self.root.after_cancel(self.pump_id)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _work(self, key):
+        # Runs on a worker thread: PIL only, no Tk calls here
+        path, size, radius, _ = key
+        try: self.results.put((key, load_round_image(path, size, radius), None))
+        except Exception as e: self.results.put((key, None, e))
+
+    def _schedule_pump(self):
+        if self.pump_id is None: self.pump_id = self.root.after(15, self._pump)
+
+    def _pump(self):
+        self.pump_id = None
+        while True:
+            try: key, img, error = self.results.get_nowait()
+            except queue.Empty: break
+
+            entry = self.pending.pop(key, None)
+            if entry is None: continue
+            tickets = [t for t in entry[1] if not t.cancelled]
+            if error is not None:
+                print(f"Error making round image: {error}")
+                continue
+
+            photo = ImageTk.PhotoImage(img)
+            self.cache.put(key, photo, key[1][0] * key[1][1])
+            for t in tickets: t.callback(photo)
+
+        if self.pending: self._schedule_pump()
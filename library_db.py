@@ -0,0 +1,123 @@
+import os
+import sqlite3
+
+from music_library import MusicLibrary
+from player import load_songs_from_file, SongJournal
+
+DB_FILE = "songs.db"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    title_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    track_number INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    genre TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    is_liked INTEGER NOT NULL DEFAULT 0,
+    play_count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Song columns in add_song() order
+COLUMNS = ("title", "artist", "album", "track_number", "duration", "genre", "filepath", "image_path", "is_liked", "play_count")
+
+class SongStore:
+    """
+    Optional SQLite storage for the library (songs.db, WAL mode), used instead of
+    songs.txt + SongJournal. Every change is one small UPDATE/INSERT/DELETE and titles
+    may contain "|". The app still loads every song into the MusicLibrary, views and
+    search work from there.
+    Same shape as SongJournal: load (or migrate), attach(library), close().
+    """
+    def __init__(self, filename=DB_FILE):
+        self.filename = filename
+        self.library = None
+        self.status = "saved" # Same values as SongJournal.status, writes here are synchronous
+        self.db = sqlite3.connect(filename)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL only skips the fsync per commit: a power cut can lose the last
+        # few changes, never corrupt the file
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    # --- LOADING ---
+    def migrate(self, text_file="songs.txt"):
+        """One shot: copies songs.txt (and its journal) into a brand new database."""
+        if self.db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION: return "Database is up to date."
+        count = 0
+        if os.path.exists(text_file):
+            old = MusicLibrary()
+            load_songs_from_file(old, text_file)
+            SongJournal(text_file).replay(old)
+            with self.db:
+                self.db.executemany(f"INSERT OR REPLACE INTO songs (title_key, {', '.join(COLUMNS)}) "
+                                    f"VALUES (?, {', '.join('?' * len(COLUMNS))})",
+                                    (self._row(s) for s in old.all_songs.values()))
+            count = len(old.all_songs)
+        with self.db: self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return f"Migrated {count} songs from {text_file}."
+
+    def read_songs(self):
+        """Streams the songs like player.read_songs_file(): yields (fraction read, add_song() arguments)."""
+        total = self.count() or 1
+        for i, row in enumerate(self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM songs ORDER BY id"), 1):
+            yield i / total, row[:8] + (bool(row[8]), row[9])
+
+    def load(self, library):
+        count = library.add_songs(args for _, args in self.read_songs())
+        return f"Loaded {count} songs."
+
+    def attach(self, library):
+        """Starts writing every change to library through. Call after load()."""
+        self.library = library
+        library.on_change = self.record
+
+    # --- WRITING ---
+    def _row(self, song):
+        return (song.title.lower(), song.title, song.artist, song.album, song.track_number, song.duration,
+                song.genre, song.filepath, song.image_path, int(song.is_liked), song.play_count)
+
+    def record(self, op, song, fields, title):
+        """MusicLibrary.on_change hook: one statement, one transaction."""
+        try:
+            with self.db:
+                if op == "delete":
+                    self.db.execute("DELETE FROM songs WHERE title_key = ?", (title.lower(),))
+                elif op == "add":
+                    self.db.execute(f"INSERT OR REPLACE INTO songs (title_key, {', '.join(COLUMNS)}) "
+                                    f"VALUES (?, {', '.join('?' * len(COLUMNS))})", self._row(song))
+                else:
+                    names = [n for n in COLUMNS if n in fields]
+                    values = [int(getattr(song, n)) if n == "is_liked" else getattr(song, n) for n in names]
+                    if "title" in fields:
+                        names.append("title_key")
+                        values.append(song.title.lower())
+                    self.db.execute(f"UPDATE songs SET {', '.join(f'{n} = ?' for n in names)} WHERE title_key = ?",
+                                    values + [title.lower()])
+            self.status = "saved"
+        except sqlite3.Error as e:
+            print(f"⚠️ Database write error: {e}")
+            self.status = "error"
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    def flush(self, timeout=None):
+        """Writes are synchronous, so this only reports whether the last one worked."""
+        return self.status == "saved"
+
+    def close(self):
+        """Folds the WAL back into songs.db and closes it."""
+        try:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            count = self.count()
+            self.db.close()
+            return f"Saved {count} songs."
+        except sqlite3.Error as e:
+            return f"Error: {e}"
@@ -0,0 +1,262 @@
+import os
+
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+# ID3v2 text frames we keep (2.3/2.4 ids, then the 3-letter 2.2 ones)
+ID3_FRAMES = {b"TIT2": "title", b"TPE1": "artist", b"TALB": "album", b"TRCK": "track", b"TCON": "genre"}
+ID3_FRAMES_V22 = {b"TT2": "title", b"TP1": "artist", b"TAL": "album", b"TRK": "track", b"TCO": "genre"}
+ID3_ENCODINGS = ("latin-1", "utf-16", "utf-16-be", "utf-8")
+# RIFF INFO chunks of a WAV file
+WAV_INFO = {b"INAM": "title", b"IART": "artist", b"IPRD": "album", b"ITRK": "track", b"IPRT": "track", b"IGNR": "genre"}
+
+# The ID3v1 genre numbers (also used as "(17)" in ID3v2)
+ID3_GENRES = (
+    "Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge", "Hip-Hop", "Jazz", "Metal",
+    "New Age", "Oldies", "Other", "Pop", "R&B", "Rap", "Reggae", "Rock", "Techno", "Industrial",
+    "Alternative", "Ska", "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient", "Trip-Hop", "Vocal", "Jazz+Funk",
+    "Fusion", "Trance", "Classical", "Instrumental", "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+    "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative", "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic",
+    "Darkwave", "Techno-Industrial", "Electronic", "Pop-Folk", "Eurodance", "Dream", "Southern Rock", "Comedy", "Cult", "Gangsta",
+    "Top 40", "Christian Rap", "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave", "Psychadelic", "Rave", "Showtunes",
+    "Trailer", "Lo-Fi", "Tribal", "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical", "Rock & Roll", "Hard Rock",
+)
+
+# MPEG audio frame headers: kbps per (version, layer), sample rates per version
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+BITRATES[(2, 3)] = BITRATES[(2, 2)]
+SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 3: (11025, 12000, 8000)} # 3 = MPEG 2.5
+HEAD_BYTES = 64 * 1024   # How far past the ID3 tag we look for the first audio frame
+SCAN_BLOCK = 1024 * 1024 # Read size when a VBR file without a Xing/VBRI header has to be walked frame by frame
+
+def probe(path):
+    """
+    Reads a song's tags and length from its headers only, without decoding any audio.
+    Returns a dict with some of "title", "artist", "album", "track", "genre" (whatever
+    the file has), "duration" in seconds, "bitrate" in kbps (the average for VBR files)
+    and "sample_rate" in Hz. Raises OSError for unreadable files and ValueError for files
+    that aren't songs or whose headers are broken.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(12)
+        f.seek(0)
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE": return _probe_wav(f, size)
+        return _probe_mp3(f, size)
+
+# --- MP3 ---
+def _probe_mp3(f, size):
+    info, tag_size = _read_id3v2(f)
+    f.seek(tag_size)
+    data = f.read(HEAD_BYTES)
+    f.seek(max(size - 128, 0))
+    tail = f.read(128)
+    has_v1 = len(tail) == 128 and tail[:3] == b"TAG"
+    if has_v1:
+        for name, value in _read_id3v1(tail).items(): info.setdefault(name, value)
+
+    pos, frame = _first_frame(data)
+    if frame is None:
+        if not info: raise ValueError("no MP3 audio found")
+        return info
+    start, end = tag_size + pos, size - (128 if has_v1 else 0)
+    # VBR encoders put the frame count (and size) in a Xing/Info or VBRI header in the first frame
+    frames, audio_bytes = _xing_header(data, pos, frame) or _vbri_header(data, pos)
+    if not frames:
+        bitrates = _bitrates(data, pos, frame)
+        if len(set(bitrates)) == 1: # Constant bitrate: the size says how long it is
+            seconds = (end - start) * 8 / (frame["bitrate"] * 1000)
+            info.update(duration=round(seconds), bitrate=frame["bitrate"], sample_rate=frame["sample_rate"])
+            return info
+        frames, audio_bytes = _count_frames(f, start, end, frame)
+    seconds = frames * frame["samples"] / frame["sample_rate"]
+    info["duration"] = round(seconds)
+    info["bitrate"] = round((audio_bytes or end - start) * 8 / seconds / 1000) if seconds else frame["bitrate"]
+    info["sample_rate"] = frame["sample_rate"]
+    return info
+
+def _syncsafe(b):
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+def _read_id3v2(f):
+    """(tags, bytes the tag takes at the start of the file) of an ID3v2 tag, ({}, 0) without one."""
+    head = f.read(10)
+    if len(head) < 10 or head[:3] != b"ID3": return {}, 0
+    major, flags = head[3], head[5]
+    size = _syncsafe(head[6:10])
+    total = 10 + size + (10 if flags & 0x10 else 0) # 0x10: footer
+    data = f.read(size)
+    if flags & 0x80 and major < 4: data = data.replace(b"\xff\x00", b"\xff") # Unsynchronised tag
+
+    pos = 0
+    if flags & 0x40 and major >= 3: # Extended header
+        if len(data) < 4: raise ValueError("ID3 extended header cut short")
+        pos = _syncsafe(data[:4]) if major == 4 else int.from_bytes(data[:4], "big") + 4
+    id_len, header_len, names = (3, 6, ID3_FRAMES_V22) if major == 2 else (4, 10, ID3_FRAMES)
+    tags = {}
+    while pos + header_len <= len(data) and data[pos]:
+        frame_id = data[pos:pos + id_len]
+        if major == 2: frame_size = int.from_bytes(data[pos + 3:pos + 6], "big")
+        elif major == 4: frame_size = _syncsafe(data[pos + 4:pos + 8])
+        else: frame_size = int.from_bytes(data[pos + 4:pos + 8], "big")
+        body = data[pos + header_len:pos + header_len + frame_size]
+        fmt = data[pos + 9] if major >= 3 else 0 # Frame format flags
+        pos += header_len + frame_size
+        name = names.get(frame_id)
+        if not name or not body or name in tags: continue
+        if fmt & (0x0C if major == 4 else 0xC0): continue # Compressed or encrypted
+        if major == 4 and fmt & 0x01: body = body[4:]   # Data length indicator
+        text = _id3_text(body)
+        if text: tags[name] = text
+    return _clean_tags(tags), total
+
+def _id3_text(body):
+    if not body: return ""
+    encoding = ID3_ENCODINGS[body[0]] if body[0] < len(ID3_ENCODINGS) else "latin-1"
+    # 2.4 allows several values separated by nulls, the first one will do
+    return body[1:].decode(encoding, "replace").split("\x00")[0].strip()
+
+def _read_id3v1(tail):
+    text = lambda b: b.split(b"\x00")[0].decode("latin-1").strip()
+    tags = {"title": text(tail[3:33]), "artist": text(tail[33:63]), "album": text(tail[63:93])}
+    if tail[125] == 0 and tail[126]: tags["track"] = str(tail[126]) # ID3v1.1
+    if tail[127] < len(ID3_GENRES): tags["genre"] = ID3_GENRES[tail[127]]
+    return _clean_tags(tags)
+
+def _clean_tags(tags):
+    """Drops empty tags, makes "track" a number and resolves ID3 genre numbers."""
+    clean = {k: v for k, v in tags.items() if v}
+    track = clean.pop("track", "")
+    number = track.split("/")[0].strip() # "3/12"
+    if number.isdigit(): clean["track"] = int(number)
+    genre = clean.get("genre", "")
+    if genre.startswith("(") and ")" in genre: # "(17)" or "(17)Rock"
+        number, _, rest = genre[1:].partition(")")
+        genre = rest or number
+    if genre.isdigit():
+        genre = ID3_GENRES[int(genre)] if int(genre) < len(ID3_GENRES) else ""
+    if genre: clean["genre"] = genre
+    else: clean.pop("genre", None)
+    return clean
+
+def _frame_header(b, pos):
+    """The MPEG audio frame header at data[pos], or None if there isn't a valid one."""
+    if pos + 4 > len(b) or b[pos] != 0xFF or b[pos + 1] & 0xE0 != 0xE0: return None
+    version = (3, None, 2, 1)[(b[pos + 1] >> 3) & 3]
+    layer = (None, 3, 2, 1)[(b[pos + 1] >> 1) & 3]
+    bitrate_index, rate_index = b[pos + 2] >> 4, (b[pos + 2] >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3: return None
+    bitrate = BITRATES[(min(version, 2), layer)][bitrate_index]
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b[pos + 2] >> 1) & 1
+    samples = 384 if layer == 1 else (1152 if layer == 2 or version == 1 else 576)
+    if layer == 1: length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else: length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return {"version": version, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+            "mono": b[pos + 3] >> 6 == 3, "samples": samples, "length": length}
+
+def _same_stream(frame, first):
+    return frame is not None and frame["version"] == first["version"] and frame["layer"] == first["layer"] \
+        and frame["sample_rate"] == first["sample_rate"]
+
+def _first_frame(data):
+    """(position, header) of the first frame in data. A lone 0xFF in junk or album art looks like
+    a header too, so it only counts if the next frame starts right where this one ends."""
+    pos = data.find(b"\xff")
+    while pos != -1:
+        frame = _frame_header(data, pos)
+        if frame:
+            after = pos + frame["length"]
+            if after + 4 > len(data) or _same_stream(_frame_header(data, after), frame): return pos, frame
+        pos = data.find(b"\xff", pos + 1)
+    return -1, None
+
+def _xing_header(data, pos, frame):
+    """(frames, bytes) from the Xing/Info header inside the first frame (0 when not given), or None."""
+    # The header sits right after the side information, whose size depends on version and channels
+    side = (17 if frame["mono"] else 32) if frame["version"] == 1 else (9 if frame["mono"] else 17)
+    at = pos + 4 + side
+    if data[at:at + 4] not in (b"Xing", b"Info"): return None
+    flags = int.from_bytes(data[at + 4:at + 8], "big")
+    frames = int.from_bytes(data[at + 8:at + 12], "big") if flags & 1 else 0
+    at += 12 if flags & 1 else 8
+    return frames, int.from_bytes(data[at:at + 4], "big") if flags & 2 else 0
+
+def _vbri_header(data, pos):
+    """(frames, bytes) from a VBRI header (Fraunhofer encoders), always 32 bytes after the frame header."""
+    at = pos + 36
+    if data[at:at + 4] != b"VBRI": return 0, 0
+    return int.from_bytes(data[at + 14:at + 18], "big"), int.from_bytes(data[at + 10:at + 14], "big")
+
+def _bitrates(data, pos, first):
+    """Bitrates of the frames that follow each other in data, starting at pos."""
+    bitrates = []
+    frame = first
+    while _same_stream(frame, first):
+        bitrates.append(frame["bitrate"])
+        pos += frame["length"]
+        frame = _frame_header(data, pos)
+    return bitrates
+
+def _count_frames(f, start, end, first):
+    """(frames, bytes) of the whole file, hopping from frame header to frame header (only the 4 header
+    bytes of each frame are looked at). For VBR files that have no Xing/VBRI header."""
+    frames = total = 0
+    pos, buf, buf_start = start, b"", start
+    while pos + 4 <= end:
+        i = pos - buf_start
+        if i + 4 > len(buf):
+            f.seek(pos)
+            buf, buf_start, i = f.read(min(SCAN_BLOCK, end - pos)), pos, 0
+            if len(buf) < 4: break
+        frame = _frame_header(buf, i)
+        if not _same_stream(frame, first):
+            # Lost sync (junk between frames): carry on at the next possible header
+            j = buf.find(b"\xff", i + 1)
+            pos = buf_start + (j if j != -1 else len(buf))
+            continue
+        frames += 1
+        total += frame["length"]
+        pos += frame["length"]
+    return frames, total
+
+# --- WAV ---
+def _probe_wav(f, size):
+    f.seek(12)
+    info, byte_rate, data_size = {}, 0, 0
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8: break
+        chunk_id, chunk_size = chunk[:4], int.from_bytes(chunk[4:], "little")
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            sample_rate = int.from_bytes(fmt[4:8], "little")
+            byte_rate = int.from_bytes(fmt[8:12], "little")
+        elif chunk_id == b"data":
+            data_size = min(chunk_size, size - f.tell()) # Cut short files still play what's there
+            f.seek(chunk_size, 1)
+        elif chunk_id == b"LIST":
+            body = f.read(chunk_size)
+            if body[:4] == b"INFO": info = _read_wav_info(body)
+        else: f.seek(chunk_size, 1)
+        if chunk_size & 1: f.seek(1, 1) # Chunks are padded to an even size
+    if not byte_rate: raise ValueError("WAV file without a format chunk")
+    info.update(duration=round(data_size / byte_rate), bitrate=round(byte_rate * 8 / 1000), sample_rate=sample_rate)
+    return info
+
+def _read_wav_info(body):
+    tags, pos = {}, 4
+    while pos + 8 <= len(body):
+        chunk_id, chunk_size = body[pos:pos + 4], int.from_bytes(body[pos + 4:pos + 8], "little")
+        raw = body[pos + 8:pos + 8 + chunk_size].split(b"\x00")[0]
+        pos += 8 + chunk_size + (chunk_size & 1)
+        name = WAV_INFO.get(chunk_id)
+        if name and name not in tags:
+            try: tags[name] = raw.decode("utf-8").strip()
+            except UnicodeDecodeError: tags[name] = raw.decode("latin-1").strip()
+    return _clean_tags(tags)
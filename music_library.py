@@ -1,6 +1,9 @@
 import math
-from collections import defaultdict
+import bisect
 import csv
+import gc
+import sys
+from search import SearchIndex, TEXT_FIELDS, tokenize
 
 def _format_duration(total_seconds):
     try:
@@ -12,7 +15,17 @@ def _format_duration(total_seconds):
     except (ValueError, TypeError):
         return "0:00"
 
+# Song fields that repeat across tracks, every song shares one copy of each value
+SHARED_FIELDS = ("artist", "album", "genre", "image_path")
+
+def _split_path(path):
+    """("C:/Music/Artist/Album/", "Song.mp3") with the folder interned, so songs in one folder share it."""
+    cut = max(path.rfind("/"), path.rfind("\\")) + 1
+    return sys.intern(path[:cut]), path[cut:]
+
 class MediaItem:
+    __slots__ = ("title", "duration")
+
     def __init__(self, title, duration):
         self.title = title
         self.duration = duration
@@ -20,20 +33,38 @@ class MediaItem:
         return f"{self.title} - {_format_duration(self.duration)}"
 
 class Song(MediaItem):
+    """
+    One track. Slotted (no per-song __dict__) and the repeated strings are shared:
+    artist/album/genre/cover path are interned and the file path is stored as an
+    interned folder plus the file name, which matters with a million songs.
+    """
+    __slots__ = ("artist", "album", "track_number", "genre", "_folder", "_file_name",
+                 "image_path", "is_liked", "play_count", "library")
+
     # Added play_count=0 to constructor
     def __init__(self, title, artist, album, track_number, duration, genre, filepath, image_path, is_liked=False, play_count=0):
         super().__init__(title, duration)
-        self.artist = artist
-        self.album = album
+        self.artist = sys.intern(artist)
+        self.album = sys.intern(album)
         self.track_number = track_number
-        self.genre = genre
+        self.genre = sys.intern(genre)
         self.filepath = filepath
-        self.image_path = image_path
+        self.image_path = sys.intern(image_path)
         self.is_liked = is_liked
         self.play_count = play_count # Public attribute now
+        self.library = None # Set by MusicLibrary so edits can keep its indexes up to date
+
+    @property
+    def filepath(self):
+        return self._folder + self._file_name
+
+    @filepath.setter
+    def filepath(self, path):
+        self._folder, self._file_name = _split_path(path)
         
     def play(self):
-        self.play_count += 1
+        if self.library is not None: self.library.update_song(self, play_count=self.play_count + 1)
+        else: self.play_count += 1
     
     def get_info(self):
         return f"{self.track_number}. {self.title} - {self.artist}"
@@ -43,44 +74,283 @@ class Song(MediaItem):
         return (self.title, self.artist, self.album, str(self.track_number), 
                 str(self.duration), self.genre, self.filepath, self.image_path, str(self.is_liked), str(self.play_count))
 
+# Every order the UI can show. Each gets a SortedIndex that is kept up to date.
+SORT_KEYS = {
+    "default": lambda s: (s.artist, s.album, s.track_number),
+    "title": lambda s: s.title.lower(),
+    "album": lambda s: sys.intern(s.album.lower()), # Shared like the album name itself
+    "duration": lambda s: s.duration,
+    "plays": lambda s: s.play_count,
+}
+TRACK_KEY = lambda s: s.track_number
+
+# filter_songs() checks lists up to this long song by song, longer ones through the search index
+FILTER_SCAN_LIMIT = 2000
+
+class SortedIndex:
+    """
+    Songs kept sorted by key_func. Adding/removing one song is a binary search plus a
+    list insert, so views never have to re-sort. Reading backwards gives descending order.
+    Adds are buffered until the next read, so loading a big library sorts once
+    instead of doing one list insert per song.
+    """
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self._keys = []  # (key, seq), seq breaks ties so songs are never compared
+        self._songs = [] # Same order as keys
+        self.pending = [] # ((key, seq), song) added since the last read
+
+    def __len__(self):
+        return len(self._songs) + len(self.pending)
+
+    @property
+    def keys(self):
+        self._flush()
+        return self._keys
+
+    @property
+    def songs(self):
+        self._flush()
+        return self._songs
+
+    def add(self, song, seq):
+        self.pending.append(((self.key_func(song), seq), song))
+
+    def _flush(self):
+        if not self.pending: return
+        if len(self.pending) < 32:
+            for entry, song in self.pending:
+                i = bisect.bisect_left(self._keys, entry)
+                self._keys.insert(i, entry)
+                self._songs.insert(i, song)
+        else:
+            # Sort the new ones, then merge: a binary search per new song and slice copies
+            # of the old runs in between (no per-song Python work for the old ones)
+            self.pending.sort(key=lambda p: p[0])
+            old_keys, old_songs = self._keys, self._songs
+            keys, songs, lo = [], [], 0
+            for entry, song in self.pending:
+                i = bisect.bisect_left(old_keys, entry, lo)
+                keys += old_keys[lo:i]
+                songs += old_songs[lo:i]
+                keys.append(entry)
+                songs.append(song)
+                lo = i
+            self._keys = keys + old_keys[lo:]
+            self._songs = songs + old_songs[lo:]
+        self.pending = []
+
+    def remove(self, song, seq):
+        # Must be called BEFORE the song's fields change, the key has to match
+        entry = (self.key_func(song), seq)
+        keys = self.keys
+        i = bisect.bisect_left(keys, entry)
+        if i < len(keys) and keys[i] == entry:
+            del keys[i]
+            del self._songs[i]
+
+    def ordered(self, reverse=False, start=0, stop=None):
+        if not reverse: return self.songs[start:stop]
+        # Descending page [start:stop) is the mirrored ascending range, read backwards
+        n = len(self.songs)
+        stop = n if stop is None else min(stop, n)
+        if start >= stop: return []
+        return self.songs[n - stop:n - start][::-1]
+
 class MusicLibrary:
     def __init__(self):
         self.all_songs = {} 
         self.genres = set()
         self.albums = set()
+        self.sort_indexes = {name: SortedIndex(key) for name, key in SORT_KEYS.items()}
+        self._seq = {} # song -> insertion number (tie breaker for the indexes)
+        self._next_seq = 0
+        # Secondary indexes. A group is dropped (and leaves genres/albums) when its last song goes
+        self.album_tracks = {}  # album -> SortedIndex in track order
+        self.artist_songs = {}  # artist -> {song: None} (insertion ordered set)
+        self.genre_songs = {}   # genre -> {song: None}
+        self.liked_songs = {}   # {song: None}
+        # Full-text search, doc id = the song's seq. Ties are ranked with the play count index
+        self.search_index = SearchIndex(popular=lambda: reversed(self.sort_indexes["plays"].songs),
+                                        doc_of=self._seq.__getitem__)
+        self._edited = set() # not-yet-added songs whose text changed, so their snapshot words are stale
+        # on_change(op, song, fields, title) after every add/update/delete, e.g. to journal it.
+        # op is "add", "update" or "delete", title is the one the song was stored under before
+        self.on_change = None
+
+    # --- INDEX MAINTENANCE ---
+    def _index_song(self, song, text=True, words=None):
+        seq = self._seq[song]
+        if text: self.search_index.add(seq, song, words)
+        else: self.search_index.set_plays(seq, song.play_count)
+        for index in self.sort_indexes.values(): index.add(song, seq)
+        self.album_tracks.setdefault(song.album, SortedIndex(TRACK_KEY)).add(song, seq)
+        self.artist_songs.setdefault(song.artist, {})[song] = None
+        self.genre_songs.setdefault(song.genre, {})[song] = None
+        if song.is_liked: self.liked_songs[song] = None
+        self.albums.add(song.album)
+        self.genres.add(song.genre)
+
+    def _unindex_song(self, song, text=True):
+        seq = self._seq[song]
+        if text: self.search_index.remove(seq)
+        for index in self.sort_indexes.values(): index.remove(song, seq)
+
+        tracks = self.album_tracks.get(song.album)
+        if tracks:
+            tracks.remove(song, seq)
+            if not len(tracks):
+                del self.album_tracks[song.album]
+                self.albums.discard(song.album)
+        self._remove_from_group(self.artist_songs, song.artist, song)
+        if self._remove_from_group(self.genre_songs, song.genre, song): self.genres.discard(song.genre)
+        self.liked_songs.pop(song, None)
+
+    def _remove_from_group(self, groups, name, song):
+        """Removes song from groups[name]; returns True if that was the last one."""
+        group = groups.get(name)
+        if group is None: return False
+        group.pop(song, None)
+        if group: return False
+        del groups[name]
+        return True
+
+    def update_song(self, song, **fields):
+        """
+        Changes song fields (e.g. play_count=3, is_liked=True) and keeps every index correct.
+        A new title must not belong to another song, returns False (nothing changed) if it does.
+        """
+        if song not in self._seq:
+            old_title = song.title
+            for name, value in fields.items(): setattr(song, name, value)
+            if song.library is self and not TEXT_FIELDS.isdisjoint(fields): self._edited.add(song)
+            # Not in yet (a snapshot song shown before the load got to it): still report the change
+            if song.library is self and self.on_change: self.on_change("update", song, fields, old_title)
+            return True
+        old_title = song.title
+        key, new_key = old_title.lower(), fields.get("title", old_title).lower()
+        if new_key != key and new_key in self.all_songs:
+            print(f"Can't rename '{old_title}': there already is a song called '{fields['title']}'")
+            return False
+        # Play counts and likes change a lot, only re-tokenize when searchable text changed
+        text = not TEXT_FIELDS.isdisjoint(fields)
+        self._unindex_song(song, text)
+        for name, value in fields.items():
+            if name in SHARED_FIELDS: value = sys.intern(value)
+            setattr(song, name, value)
+        if new_key != key: self.all_songs[new_key] = self.all_songs.pop(key)
+        self._index_song(song, text)
+        if self.on_change: self.on_change("update", song, fields, old_title)
+        return True
+
+    def sorted_songs(self, key="default", reverse=False, start=0, stop=None):
+        """Songs in one of the SORT_KEYS orders, optionally just a slice (a page) of them."""
+        return self.sort_indexes[key].ordered(reverse, start, stop)
         
     # Updated add_song to accept play_count
     def add_song(self, title, artist, album, track_number, duration, genre, filepath, image_path, is_liked=False, play_count=0):
         key = title.lower()
         if key in self.all_songs: 
             # Update existing song's volatile data
-            self.all_songs[key].is_liked = is_liked
-            self.all_songs[key].play_count = play_count
+            self.update_song(self.all_songs[key], is_liked=is_liked, play_count=play_count)
             return
-        
-        new_song = Song(title, artist, album, track_number, duration, genre, filepath, image_path, is_liked, play_count)
+        return self.insert_song(Song(title, artist, album, track_number, duration, genre, filepath, image_path, is_liked, play_count))
+
+    def insert_song(self, new_song, words=None):
+        """
+        Adds an already built Song (e.g. one a snapshot made), like add_song() does.
+        words are its search words as song_words() returns them, if known, so they aren't tokenized again.
+        """
+        if new_song in self._edited:
+            self._edited.discard(new_song)
+            words = None
+        key = new_song.title.lower()
+        if key in self.all_songs:
+            self.update_song(self.all_songs[key], is_liked=new_song.is_liked, play_count=new_song.play_count)
+            return
+        new_song.library = self
         self.all_songs[key] = new_song
-        self.genres.add(genre)
-        self.albums.add(album)
+        self._seq[new_song] = self._next_seq
+        self._next_seq += 1
+        self._index_song(new_song, words=words)
+        if self.on_change: self.on_change("add", new_song, {}, new_song.title)
         return f"Added song: {new_song.title}"
+
+    def song_words(self, song):
+        """The song's search words, flat: (word, field bits, word, field bits, ...)."""
+        return self.search_index.doc_words.get(self._seq.get(song), ())
     
+    def add_songs(self, rows):
+        """
+        add_song() for every row of its arguments (e.g. a chunk of songs.txt), or insert_song()
+        for (Song, words) rows from a snapshot. Returns how many went in.
+        """
+        # Everything added here stays alive, so cycle collections in between would only re-scan
+        # the growing library (about a third of a big load's time)
+        was_enabled = gc.isenabled()
+        gc.disable()
+        count = 0
+        try:
+            for row in rows:
+                try:
+                    if isinstance(row[0], Song): self.insert_song(*row)
+                    else: self.add_song(*row)
+                    count += 1
+                except Exception as e: print(f"Error loading song: {e}")
+        finally:
+            if was_enabled: gc.enable()
+        return count
+
     def get_sorted_song_list(self):
-        songs = list(self.all_songs.values())
-        songs.sort(key=lambda s: (s.artist, s.album, s.track_number))
-        return songs
+        return self.sorted_songs("default")
 
     def get_songs_by_album(self):
-        albums = defaultdict(list)
-        for song in self.all_songs.values():
-            albums[song.album].append(song)
-        for album in albums:
-            albums[album].sort(key=lambda s: s.track_number)
-        return dict(sorted(albums.items()))
+        # Only the album names get sorted, each track list is already in order
+        return {album: self.album_tracks[album].ordered() for album in sorted(self.album_tracks)}
+
+    def get_album_songs(self, album):
+        tracks = self.album_tracks.get(album)
+        return tracks.ordered() if tracks else []
+
+    def get_artist_songs(self, artist):
+        return list(self.artist_songs.get(artist, ()))
+
+    def get_genre_songs(self, genre):
+        return list(self.genre_songs.get(genre, ()))
+
+    def get_liked_songs(self):
+        return sorted(self.liked_songs, key=lambda s: s.artist)
+
+    def search(self, query, limit=None, fuzzy=False):
+        """
+        Songs matching every word of query in title/artist/album/genre, best match first.
+        fuzzy=True also accepts misspelled words (fewest typos ranked first).
+        """
+        if fuzzy: return self.search_index.fuzzy_search(query, limit)
+        return self.search_index.search(query, limit)
+
+    def filter_songs(self, songs, query):
+        """
+        The songs (order kept) where every word of query starts a word of their
+        title/artist/album/genre. Short lists are checked song by song, long ones
+        go through the search index.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms: return list(songs)
+        index = self.search_index
+        if len(songs) > FILTER_SCAN_LIMIT:
+            docs = index.prefix_matches(terms)
+            return [s for s in songs if self._seq.get(s) in docs]
+        return [s for s in songs if index.starts_words(self._seq.get(s), terms)]
 
     def delete_song(self, title_input):
         key = title_input.lower()
         if key in self.all_songs:
-            del self.all_songs[key]
+            song = self.all_songs.pop(key)
+            self._unindex_song(song)
+            del self._seq[song]
+            song.library = None
+            if self.on_change: self.on_change("delete", song, {}, song.title)
             return True
         return False
         
@@ -1,60 +1,284 @@
 import os
+import threading
+import time
+
+from snapshot import write_snapshot
+
+HEADER = "TITLE|ARTIST|ALBUM|TRACK|DURATION|GENRE|FILEPATH|IMAGE_PATH|IS_LIKED|PLAY_COUNT\n"
+
+# The journal is folded into songs.txt (in the background) once it has this many records
+COMPACT_AFTER = 500
+COMPACT_RATIO = 10 # ...or, in a bigger library, a tenth as many records as there are songs
+# Changes are written behind the UI: at most this many seconds late, many changes per write
+SAVE_DELAY = 0.25
+# If the disk falls this many records behind, record() waits for it (bounded memory, no silent loss)
+MAX_PENDING = 5000
+
+def _write_rows(filename, rows):
+    """Writes songs.txt from to_string() tuples. Temp file + rename, so a crash keeps the old file."""
+    tmp = filename + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as file:
+        file.write(HEADER)
+        file.writelines("|".join(row) + "\n" for row in rows)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, filename)
 
 def save_songs_to_file(library, filename="songs.txt"):
     try:
         # 1. Generate data in memory FIRST
-        lines_to_write = []
-        # Header now includes PLAY_COUNT
-        lines_to_write.append("TITLE|ARTIST|ALBUM|TRACK|DURATION|GENRE|FILEPATH|IMAGE_PATH|IS_LIKED|PLAY_COUNT\n")
-        
-        for song in library.all_songs.values():
-            lines_to_write.append("|".join(song.to_string()) + "\n")
-
-        # 2. Open the file ONLY if step 1 succeeded
-        with open(filename, 'w', encoding='utf-8') as file:
-            file.writelines(lines_to_write)
-        return f"Saved {len(library.all_songs)} songs."
+        rows = [song.to_string() for song in library.all_songs.values()]
+        # 2. Write the file ONLY if step 1 succeeded
+        _write_rows(filename, rows)
+        return f"Saved {len(rows)} songs."
     except Exception as e:
         print(f"⚠️ CRITICAL SAVE ERROR (File not touched): {e}")
         return f"Error: {e}"
 
+def _song_args(parts):
+    """add_song() arguments from the fields of one songs.txt line, None if it's unusable."""
+    # We need at least 8 parts for the basic app to work
+    if len(parts) < 8: return None
+    title, artist, album, track, duration, genre, filepath, image_path = parts[:8]
+
+    # Safe Loading for Liked Status
+    is_liked = False
+    if len(parts) > 8:
+        is_liked = (parts[8] == "True")
+
+    # Safe Loading for Play Count
+    play_count = 0
+    if len(parts) > 9:
+        try: play_count = int(parts[9])
+        except: play_count = 0
+
+    try: return title, artist, album, int(track), int(duration), genre, filepath, image_path, is_liked, play_count
+    except ValueError: return None
+
+def read_songs_file(filename="songs.txt"):
+    """
+    Streams songs.txt one line at a time: yields (fraction of the file read, add_song() arguments)
+    for every good line. Broken lines are reported and skipped, they never stop the load.
+    """
+    total = os.path.getsize(filename) or 1
+    # errors="replace": a few bad bytes cost one field its accents, not the whole load
+    with open(filename, 'r', encoding='utf-8', errors='replace') as file:
+        done = len(file.readline()) # Header
+        for number, line in enumerate(file, 2):
+            done += len(line) # Characters, not bytes: close enough for a progress bar
+            args = _song_args(line.strip().split('|'))
+            if args: yield min(done / total, 1.0), args
+            elif line.strip(): print(f"Skipped bad line {number} in {filename}")
+
 def load_songs_from_file(library, filename="songs.txt"):
     try:
         if not os.path.exists(filename): return "No save file found."
-        
-        with open(filename, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-            count = 0
-            for line in lines[1:]:
-                parts = line.strip().split('|')
-                # We need at least 8 parts for the basic app to work
-                if len(parts) >= 8:
-                    title = parts[0]
-                    artist = parts[1]
-                    album = parts[2]
-                    track = parts[3]
-                    duration = parts[4]
-                    genre = parts[5]
-                    filepath = parts[6]
-                    image_path = parts[7]
-                    
-                    # Safe Loading for Liked Status
-                    is_liked = False
-                    if len(parts) > 8:
-                        is_liked = (parts[8] == "True")
-                        
-                    # Safe Loading for Play Count
-                    play_count = 0
-                    if len(parts) > 9:
-                        try: play_count = int(parts[9])
-                        except: play_count = 0
-
-                    try:
-                        library.add_song(title, artist, album, int(track), int(duration), genre, filepath, image_path, is_liked, play_count)
-                        count += 1
-                    except ValueError: pass
-                    except Exception as e: print(f"Error loading line: {e}")
-                    
+        count = library.add_songs(args for _, args in read_songs_file(filename))
         return f"Loaded {count} songs."
     except Exception as e:
-        return f"Load Error: {e}"
\ No newline at end of file
+        return f"Load Error: {e}"
+
+class SongJournal:
+    """
+    Write-ahead log next to songs.txt, so a like, play, edit, add or delete costs one
+    small append instead of rewriting the whole file. Records hold absolute values
+    (play count 7, not +1), so replaying one twice does no harm.
+
+    All disk I/O happens on one writer thread. record() only queues lines; the writer
+    waits SAVE_DELAY for more to pile up and appends + fsyncs them together, so ten likes
+    in a row are one write. Once the journal gets long it's rotated to .old and folded into
+    songs.txt (temp file + fsync + rename) by the same thread, in queue order; .old is only
+    deleted after the new songs.txt is in place.
+    status is "saved", "saving", "waiting" (the UI is held up by a slow disk) or "error".
+    """
+    def __init__(self, filename="songs.txt", compact_after=COMPACT_AFTER, delay=SAVE_DELAY, max_pending=MAX_PENDING):
+        self.filename = filename
+        self.path = filename + ".journal"
+        self.old_path = self.path + ".old" # Rotated out, being compacted
+        self.compact_after = compact_after
+        self.delay = delay
+        self.max_pending = max_pending
+        self.library = None
+        self.file = None          # Only touched by the writer thread
+        self.records = 0          # Records in the current journal
+        self.status = "saved"
+        self.pending = []         # Journal lines and songs.txt snapshots ((rows, words)) for the writer, in order
+        self.busy = False         # The writer is working on a batch
+        self.closing = False
+        self.cond = threading.Condition()
+        self.writer = None
+
+    def attach(self, library):
+        """Starts journaling every change to library. Call after load_songs_from_file() and replay()."""
+        self.library = library
+        library.on_change = self.record
+
+    # --- WRITING ---
+    def record(self, op, song, fields, title):
+        """MusicLibrary.on_change hook: turns one change into journal lines for the writer."""
+        if op == "delete": lines = [("delete", title)]
+        elif op == "add": lines = [("add",) + song.to_string()]
+        elif set(fields) - {"is_liked", "play_count"}: lines = [("edit", title) + song.to_string()]
+        else:
+            lines = []
+            if "is_liked" in fields: lines.append(("like" if song.is_liked else "unlike", title))
+            if "play_count" in fields: lines.append(("play", title, str(song.play_count)))
+        with self.cond:
+            # Backpressure: don't let a stalled disk pile up changes without limit
+            while len(self.pending) >= self.max_pending and self.status != "error":
+                self.status = "waiting"
+                self.cond.wait(0.1)
+            self.pending.extend("|".join(line) + "\n" for line in lines)
+            if self.status != "error": self.status = "saving"
+            self.cond.notify_all()
+        self._start_writer()
+        self.records += len(lines)
+        # Compaction needs the whole library, so only once attach()ed. It rewrites all of it, so a big
+        # library (or a folder scan adding thousands of songs) lets the journal grow in proportion
+        if self.library is not None and self.records >= max(self.compact_after, len(self.library.all_songs) // COMPACT_RATIO):
+            self.compact()
+
+    def _start_writer(self):
+        if self.writer and self.writer.is_alive(): return
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing: self.cond.wait()
+                if not self.pending: return # Closing, nothing left
+            if not self.closing: time.sleep(self.delay) # Let more changes join this write
+            with self.cond:
+                batch, self.pending = self.pending, []
+                self.busy = True
+            ok, unwritten = self._write(batch)
+            with self.cond:
+                self.pending[:0] = unwritten # Tried again next round, still in order
+                self.busy = False
+                self.status = "error" if not ok else "saving" if self.pending else "saved"
+                self.cond.notify_all()
+                if not ok and self.closing: return
+
+    def _write(self, batch):
+        """
+        Writes batch in order: lines are appended together, a (rows, words) snapshot compacts.
+        Returns (ok, what couldn't be written). A failed compaction isn't retried,
+        the journal files still hold every change and get replayed on the next start.
+        """
+        ok, lines = True, []
+        for i, item in enumerate(batch):
+            if isinstance(item, str):
+                lines.append(item)
+                continue
+            if lines and not self._append(lines): return False, lines + batch[i:]
+            lines = []
+            ok = self._compact(*item) and ok
+        if lines and not self._append(lines): return False, lines
+        return ok, []
+
+    def _append(self, lines):
+        try:
+            if self.file is None: self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write("".join(lines))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            return True
+        except Exception as e:
+            print(f"⚠️ Journal write error: {e}")
+            return False
+
+    # --- LOADING ---
+    def replay(self, library):
+        """Re-applies the journal (an unfinished compaction's first) on top of the loaded songs.txt."""
+        count = 0
+        for path in (self.old_path, self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file: lines = file.readlines()
+            except FileNotFoundError: continue
+            for line in lines:
+                # A crash mid-append leaves a last line without its newline, skip it
+                if not line.endswith("\n"): break
+                try:
+                    if self._apply(library, line[:-1].split('|')): count += 1
+                except Exception as e: print(f"Error replaying journal line: {e}")
+            if path == self.path: self.records = len(lines)
+        return f"Replayed {count} changes."
+
+    def _apply(self, library, parts):
+        op, args = parts[0], parts[1:]
+        if op == "add":
+            song_args = _song_args(args)
+            if song_args: library.add_song(*song_args)
+            return bool(song_args)
+        song = library.all_songs.get(args[0].lower()) if args else None
+        if song is None: return False # Deleted (or renamed) later on
+        if op == "delete": return library.delete_song(args[0])
+        if op in ("like", "unlike"): return library.update_song(song, is_liked=op == "like")
+        if op == "play": return library.update_song(song, play_count=int(args[1]))
+        if op == "edit":
+            song_args = _song_args(args[1:])
+            if not song_args: return False
+            names = ("title", "artist", "album", "track_number", "duration", "genre", "filepath", "image_path", "is_liked", "play_count")
+            return library.update_song(song, **dict(zip(names, song_args)))
+        return False
+
+    # --- COMPACTION ---
+    def compact(self, snapshot=False):
+        """
+        Folds the journal into songs.txt, with snapshot=True also writes its binary snapshot
+        (on close and when there was none: it takes longer than songs.txt itself). The rows
+        (in the default view order) and search words are taken right here on the main thread
+        (a consistent snapshot), the writer thread does the rest.
+        """
+        songs = self.library.sorted_songs("default")
+        rows = [song.to_string() for song in songs]
+        words = [self.library.song_words(song) for song in songs] if snapshot else None
+        with self.cond:
+            # Queued in line: changes before it go to the old journal, changes after it to the new one
+            self.pending.append((rows, words))
+            if self.status != "error": self.status = "saving"
+            self.cond.notify_all()
+        self.records = 0
+        self._start_writer()
+        return len(rows)
+
+    def _compact(self, rows, words):
+        # Writer thread: new records go to a fresh journal from here on
+        try:
+            if self.file: self.file.close()
+            self.file = None
+            if not os.path.exists(self.path): open(self.old_path, 'a').close()
+            elif os.path.exists(self.old_path):
+                # A compaction failed earlier: keep its records, they aren't in songs.txt yet
+                with open(self.path, 'r', encoding='utf-8') as src, open(self.old_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else: os.replace(self.path, self.old_path)
+            _write_rows(self.filename, rows)
+            os.remove(self.old_path)
+        except Exception as e:
+            print(f"⚠️ Compaction error (journal kept): {e}")
+            return False
+        # Only a startup shortcut: if this fails (or isn't done) the next start reads songs.txt instead
+        if words is not None:
+            try: write_snapshot(self.filename, rows, words)
+            except Exception as e: print(f"Error writing snapshot: {e}")
+        return True
+
+    def flush(self, timeout=None):
+        """Waits until everything queued so far is on disk. False if it didn't get there."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and not self.busy, timeout) and self.status == "saved"
+
+    def close(self):
+        """Final compaction and flush (no waiting out SAVE_DELAY), leaves just songs.txt and its snapshot behind."""
+        count = self.compact(snapshot=True)
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.writer.join()
+        if self.status == "error": return "Error: not everything could be saved, see the messages above."
+        return f"Saved {count} songs."
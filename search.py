@@ -0,0 +1,401 @@
+import bisect
+import heapq
+import re
+import sys
+import unicodedata
+from itertools import islice
+
+# Searchable Song fields and how much a hit in each one is worth
+FIELDS = (("title", 4), ("artist", 3), ("album", 2), ("genre", 1))
+TEXT_FIELDS = {name for name, _ in FIELDS}
+
+# How well a query term matched a word
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+
+# Fuzzy matching: how many typos a query word may have, by its length
+TYPO_BUDGET = ((4, 0), (8, 1))  # shorter than 4: none, shorter than 8: one, else two
+MAX_TYPOS = 2
+# Typo candidates are looked up by the first few letters of a word with up to MAX_TYPOS of them deleted
+DELETE_PREFIX = 7
+
+# Best field weight for every combination of field bits (bit i = FIELDS[i])
+_BITS_WEIGHT = [max([w for i, (_, w) in enumerate(FIELDS) if bits & (1 << i)], default=0)
+                for bits in range(1 << len(FIELDS))]
+
+_WORD = re.compile(r"[^\W_]+")
+
+def normalize(text):
+    """Lowercase and strip accents, so "Beyoncé" matches "beyonce"."""
+    text = str(text).lower()
+    if text.isascii(): return text # Nothing to decompose (the usual case, and a lot faster)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(text):
+    return _WORD.findall(normalize(text))
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def deletes(word, depth):
+    """word and everything you get by deleting up to depth of its letters."""
+    found = frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found = found | frontier
+    return found
+
+def typo_budget(term):
+    for length, typos in TYPO_BUDGET:
+        if len(term) < length: return typos
+    return MAX_TYPOS
+
+def letter_masks(term):
+    """Bit i of masks[c] is set when term[i] == c (input for edit_distances)."""
+    masks = {}
+    for i, c in enumerate(term): masks[c] = masks.get(c, 0) | (1 << i)
+    return masks
+
+def edit_distances(term, masks, word):
+    """
+    Optimal string alignment distance (swapping two neighbours is one edit) from term
+    to every prefix of word: result[j] is the distance to word[:j], result[-1] to the
+    whole word. Bit-parallel (Myers/Hyyro), one column of the DP table per letter of word.
+    """
+    m = len(term)
+    full, top = (1 << m) - 1, 1 << (m - 1)
+    vp, vn, d0, prev_eq = full, 0, 0, 0
+    score = m
+    result = [m]
+    for c in word:
+        eq = masks.get(c, 0)
+        swap = (((~d0) & eq) << 1) & prev_eq
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn | swap) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = vp & d0
+        if hp & top: score += 1
+        elif hn & top: score -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+        prev_eq = eq
+        result.append(score)
+    return result
+
+def fuzzy_weight(typos, whole_word, same_start):
+    """
+    Match quality of a fuzzy hit: fewer typos first, then whole words over word
+    prefixes, then words starting like the term. Steps of 8 leave room for the field
+    weight (at most 4) to break ties without ever beating a better match.
+    """
+    quality = (MAX_TYPOS - typos) * 4 + (2 if whole_word else 0) + (1 if same_start else 0)
+    return (quality + 1) * 8
+
+def _exact_score(weight, bits): return weight * _BITS_WEIGHT[bits]
+def _fuzzy_score(weight, bits): return weight + _BITS_WEIGHT[bits]
+
+class SearchIndex:
+    """
+    Inverted index over the words of title, artist, album and genre.
+    A query word matches whole words, word prefixes ("beat" -> "beatles") and,
+    through a trigram index over the vocabulary, substrings ("eatl" -> "beatles").
+    Every query word has to match; results are ranked by match quality,
+    field (title > artist > album > genre) and then play count. Songs that need a
+    substring match for some query word come after all the others, so with a limit
+    the (often thousands of) substring words are only looked at when the rest falls short.
+
+    fuzzy_search() also forgives typos. Candidate words come from a SymSpell-style
+    deletes index: every word is filed under its first DELETE_PREFIX letters with up to
+    MAX_TYPOS letters deleted, so a misspelled term finds its neighbours with a few
+    dict lookups and only those get a real edit distance computed.
+
+    Postings are sets grouped by which fields the word appeared in, so a query is
+    mostly C-level set unions/intersections per score bucket instead of a Python
+    loop over every matching song. Documents are small int ids chosen by the caller,
+    which also reports play count changes through set_plays().
+    popular() (optional) iterates songs most played first and doc_of(song) gives a
+    song's id; with them, huge result sets are ranked by walking that order.
+    """
+    def __init__(self, popular=None, doc_of=None):
+        self.popular = popular
+        self.doc_of = doc_of
+        self.songs = {}          # doc id -> song
+        self.plays = []          # doc id -> play count, ranking reads this instead of touching every Song
+        self.doc_words = {}      # doc id -> (word, field bits, word, field bits, ...) flat, to remove it again
+        self.postings = {}       # word -> {field bits: set of doc ids}
+        self.trigram_words = {}  # trigram -> set of words containing it
+        self.delete_words = None # Word start with letters deleted -> set of words, built on the first fuzzy search
+        self._vocab = None       # Sorted words for prefix ranges, rebuilt lazily after bulk loads
+
+    def __len__(self): return len(self.songs)
+
+    def add(self, doc_id, song, words=None):
+        """words: the song's (word, field bits, ...) as doc_words keeps them, if known (skips tokenizing)."""
+        if doc_id in self.songs: self.remove(doc_id)
+        if words is not None: bits = dict(zip(words[::2], words[1::2]))
+        else:
+            bits = {}
+            for bit, (field, _) in enumerate(FIELDS):
+                for word in tokenize(getattr(song, field)):
+                    word = sys.intern(word) # One copy per vocabulary word, not one per song using it
+                    bits[word] = bits.get(word, 0) | (1 << bit)
+
+        for word, b in bits.items():
+            post = self.postings.get(word)
+            if post is None:
+                post = self.postings[word] = {}
+                if self._vocab is not None: bisect.insort(self._vocab, word)
+                for tri in trigrams(word): self.trigram_words.setdefault(tri, set()).add(word)
+                if self.delete_words is not None: self._add_deletes(word)
+            post.setdefault(b, set()).add(doc_id)
+        self.songs[doc_id] = song
+        self.doc_words[doc_id] = tuple(x for pair in bits.items() for x in pair)
+        self.set_plays(doc_id, song.play_count)
+
+    def set_plays(self, doc_id, play_count):
+        if doc_id >= len(self.plays): self.plays.extend([0] * (doc_id + 1 - len(self.plays)))
+        self.plays[doc_id] = play_count
+
+    def remove(self, doc_id):
+        if doc_id not in self.songs: return
+        del self.songs[doc_id]
+        words = self.doc_words.pop(doc_id)
+        for word, b in zip(words[::2], words[1::2]):
+            post = self.postings[word]
+            docs = post[b]
+            docs.discard(doc_id)
+            if not docs: del post[b]
+            if post: continue
+            # Last song using this word
+            del self.postings[word]
+            if self._vocab is not None: del self._vocab[bisect.bisect_left(self._vocab, word)]
+            for tri in trigrams(word):
+                words = self.trigram_words[tri]
+                words.discard(word)
+                if not words: del self.trigram_words[tri]
+            if self.delete_words is None or word.isdigit(): continue
+            for key in self._delete_keys(word):
+                words = self.delete_words[key]
+                words.discard(word)
+                if not words: del self.delete_words[key]
+
+    def _sorted_vocab(self):
+        if self._vocab is None: self._vocab = sorted(self.postings)
+        return self._vocab
+
+    def _start_words(self, term):
+        """word -> match weight for every vocabulary word this query term is or starts."""
+        matches = {}
+        vocab = self._sorted_vocab()
+        i = bisect.bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term):
+            matches[vocab[i]] = EXACT if vocab[i] == term else PREFIX
+            i += 1
+        return matches
+
+    def _substring_words(self, term, starts):
+        """word -> SUBSTRING for the vocabulary words containing term elsewhere than at their start."""
+        matches = {}
+        if len(term) >= 3:
+            # Words containing every trigram of the term, smallest set first
+            sets = []
+            for tri in trigrams(term):
+                words = self.trigram_words.get(tri)
+                if not words: return matches
+                sets.append(words)
+            sets.sort(key=len)
+            for word in sets[0].intersection(*sets[1:]):
+                if word not in starts and term in word: matches[word] = SUBSTRING
+        return matches
+
+    def _fuzzy_words(self, term, max_typos=MAX_TYPOS):
+        """word -> fuzzy_weight for vocabulary words within the term's typo budget."""
+        matches = {}
+        vocab = self._sorted_vocab()
+        i = bisect.bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term):
+            matches[vocab[i]] = fuzzy_weight(0, vocab[i] == term, True)
+            i += 1
+
+        k = min(max_typos, typo_budget(term))
+        if k == 0: return matches
+
+        # Within k typos, the word starts share a string once each side drops up to k letters
+        if self.delete_words is None:
+            self.delete_words = {}
+            for word in self.postings: self._add_deletes(word)
+        candidates = set()
+        for key in deletes(term[:DELETE_PREFIX], k):
+            words = self.delete_words.get(key)
+            if words: candidates |= words
+
+        # A half-typed word that is also misspelled gets one typo at most (none below 4 letters),
+        # and only for word starts at least as long as the term, it matches far too much otherwise
+        prefix_k = 1 if len(term) >= 4 else 0
+        masks = letter_masks(term)
+        shortest, longest = len(term) - k, len(term) + k
+        for word in candidates:
+            if len(word) < shortest or word in matches: continue
+            # Past len(term) + k letters neither the whole word nor a prefix can be close enough
+            dists = edit_distances(term, masks, word[:longest])
+            whole = dists[-1] if len(word) <= longest else k + 1
+            prefix = min(dists[len(term):], default=k + 1)
+            if whole <= k and whole <= prefix:
+                matches[word] = fuzzy_weight(whole, True, word[:2] == term[:2])
+            elif prefix <= prefix_k:
+                matches[word] = fuzzy_weight(prefix, False, word[:2] == term[:2])
+        return matches
+
+    def _add_deletes(self, word):
+        if word.isdigit(): return
+        for key in self._delete_keys(word): self.delete_words.setdefault(key, set()).add(word)
+
+    def _delete_keys(self, word):
+        # Misspelled terms have at least 4 letters and at most 2 typos, so shorter keys are never looked up
+        return [key for key in deletes(word[:DELETE_PREFIX], MAX_TYPOS) if len(key) >= 2]
+
+    def _scored_postings(self, matches, score_of):
+        """[(score, set of doc ids), ...] for every (word, fields) posting a query term hits."""
+        return [(score_of(weight, bits), docs) for word, weight in matches.items()
+                for bits, docs in self.postings[word].items()]
+
+    def _doc_postings(self, docs, matches, score_of):
+        """What _scored_postings() gives for matches, cut down to docs, from the docs' own words."""
+        scored = {}
+        for doc in docs:
+            words = self.doc_words[doc]
+            for i in range(0, len(words), 2):
+                weight = matches.get(words[i])
+                if weight: scored.setdefault(score_of(weight, words[i + 1]), set()).add(doc)
+        return list(scored.items())
+
+    def _term_buckets(self, scored, within=None, enough=None):
+        """
+        {score: set of doc ids} for one query term, every doc only in its best bucket.
+        within limits the docs to a candidate set; with enough, buckets stop once
+        they hold that many docs (the lower ones can't make it into the results).
+        """
+        raw = {}
+        for score, docs in scored: raw.setdefault(score, []).append(docs)
+        buckets, seen = {}, set()
+        for score in sorted(raw, reverse=True):
+            if within is None: docs = set().union(*raw[score])
+            else: docs = set().union(*[within & d for d in raw[score]])
+            docs -= seen
+            if docs:
+                buckets[score] = docs
+                seen |= docs
+                if enough and len(seen) >= enough: break
+        return buckets
+
+    def _most_played_in(self, docs, count):
+        # Walks the play-count order in chunks, so skipping songs that don't match is C-level
+        found = []
+        order = self.popular()
+        while len(found) < count:
+            chunk = list(islice(order, 1024))
+            if not chunk: break
+            ids = list(map(self.doc_of, chunk))
+            if docs.isdisjoint(ids): continue
+            for song, doc in zip(chunk, ids):
+                if doc in docs:
+                    found.append(song)
+                    if len(found) == count: break
+        return found
+
+    def search(self, query, limit=None):
+        """Ranked list of songs matching every word of query (best first)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        starts = [self._start_words(t) for t in terms]
+        ranked = self._ranked(starts, limit, _exact_score)
+        if limit and len(ranked) >= limit: return ranked
+        substrings = [self._substring_words(t, words) for t, words in zip(terms, starts)]
+        if not any(substrings): return ranked
+        # Then the songs only found with substrings, best first (the ones above are skipped)
+        shown = set(ranked)
+        everything = [{**words, **more} for words, more in zip(starts, substrings)]
+        rest = self._ranked(everything, limit and limit + len(ranked), _exact_score)
+        ranked += [song for song in rest if song not in shown]
+        return ranked[:limit] if limit else ranked
+
+    def fuzzy_search(self, query, limit=None, max_typos=MAX_TYPOS):
+        """
+        Like search(), but every query word may also match words a few typos away
+        ("beatels" -> "beatles", "metalica" -> "metallica"). Ranked by typos, whole word
+        over prefix, matching first letters, field and then play count.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        return self._ranked([self._fuzzy_words(t, max_typos) for t in terms], limit, _fuzzy_score)
+
+    def prefix_matches(self, terms):
+        """
+        Doc ids where every term starts one of the song's words, unranked. For filtering
+        a list: "beat" keeps what "bea" kept or less, so a growing query can just refine.
+        """
+        vocab = self._sorted_vocab()
+        found = None
+        # Longest term first, it usually matches the fewest songs
+        for term in sorted(terms, key=len, reverse=True):
+            sets = []
+            i = bisect.bisect_left(vocab, term)
+            while i < len(vocab) and vocab[i].startswith(term):
+                sets.extend(self.postings[vocab[i]].values())
+                i += 1
+            found = set().union(*sets) if found is None else set().union(*[found & docs for docs in sets])
+            if not found: break
+        return found or set()
+
+    def starts_words(self, doc_id, terms):
+        """Same test as prefix_matches() for one doc, cheap for re-checking a short list."""
+        words = self.doc_words.get(doc_id, ())[::2]
+        return all(any(word.startswith(term) for word in words) for term in terms)
+
+    def _ranked(self, per_term, limit, score_of):
+        if not per_term: return []
+        scored = [self._scored_postings(matches, score_of) for matches in per_term]
+
+        if len(scored) == 1:
+            buckets = self._term_buckets(scored[0], enough=limit)
+        else:
+            # Plain AND first, cheapest term first. Each term's postings are cut down to the docs
+            # still in the running once (a set intersection only walks the smaller side) and the
+            # cut-down sets are reused for scoring, so a broad term is only walked a single time
+            order = sorted(range(len(scored)), key=lambda i: sum(len(docs) for _, docs in scored[i]))
+            scored, per_term = [scored[i] for i in order], [per_term[i] for i in order]
+            found = set().union(*[docs for _, docs in scored[0]])
+            for i in range(1, len(scored)):
+                if len(found) < len(scored[i]):
+                    # Fewer docs left than the term has postings (a short term like "pho"):
+                    # looking up the docs' own words is cheaper than a set operation per posting
+                    scored[i] = self._doc_postings(found, per_term[i], score_of)
+                else: scored[i] = [(score, found & docs) for score, docs in scored[i]]
+                found = set().union(*[docs for _, docs in scored[i]])
+                if not found: return []
+            buckets = self._term_buckets(scored[0], within=found)
+        for postings in scored[1:]:
+            # A doc sits in one bucket per term, so every (a, b) pair gives disjoint results
+            other = self._term_buckets(postings, within=found)
+            combined = {}
+            for score, docs in buckets.items():
+                for other_score, other_docs in other.items():
+                    both = docs & other_docs
+                    if both: combined.setdefault(score + other_score, set()).update(both)
+            buckets = combined
+
+        # Best score first, play count breaks ties. Only the bucket that crosses the limit is partially ranked
+        get_song = self.songs.__getitem__
+        plays = self.plays.__getitem__
+        ranked = []
+        for score in sorted(buckets, reverse=True):
+            docs = buckets[score]
+            if limit and len(ranked) + len(docs) >= limit:
+                need = limit - len(ranked)
+                # Walking the play-count order takes about need * N / len(docs) steps
+                if self.popular and need * len(self.songs) < len(docs) * len(docs):
+                    ranked += self._most_played_in(docs, need)
+                else:
+                    ranked += map(get_song, heapq.nlargest(need, docs, key=plays))
+                break
+            ranked += map(get_song, sorted(docs, key=plays, reverse=True))
+        return ranked
@@ -0,0 +1,141 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+from music_library import Song, _split_path
+
+MAGIC = b"MUSISNAP"
+VERSION = 1
+# magic, version, byte order (1 = little endian), songs, strings, word pairs, songs.txt size, songs.txt mtime (ns)
+_HEADER = struct.Struct("<8sIIIIIqq")
+
+# Per song: ids into the string table, then plain numbers (in this order in the file)
+STRING_COLUMNS = ("title", "artist", "album", "genre", "folder", "file_name", "image_path")
+NUMBER_COLUMNS = ("track_number", "duration", "play_count")
+
+def snapshot_path(filename):
+    return filename + ".snap"
+
+def _stamp(filename):
+    st = os.stat(filename)
+    return st.st_size, st.st_mtime_ns
+
+def write_snapshot(filename, rows, words):
+    """
+    Writes songs.txt's binary snapshot (next to it) from rows (Song.to_string() tuples, in the
+    order views should show them) and their search words (MusicLibrary.song_words()).
+    It's stamped with songs.txt's size and mtime, so any later change to that file invalidates it.
+    """
+    ids = {} # string -> id, in id order
+    string_id = lambda text: ids.setdefault(text, len(ids))
+    # Column by column: a comprehension per column is a lot cheaper than juggling ten lists per row
+    paths = [_split_path(r[6]) for r in rows]
+    texts = ([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], [r[5] for r in rows], # STRING_COLUMNS order
+             [p[0] for p in paths], [p[1] for p in paths], [r[7] for r in rows])
+    columns = [array("I", [string_id(t) for t in column]) for column in texts]
+    numbers = [array("i", [int(r[3]) for r in rows]), array("i", [int(r[4]) for r in rows]), array("i", [int(r[9]) for r in rows])]
+    liked = bytes(r[8] == "True" for r in rows)
+    # Words are flat (word, bits, word, bits, ...) per song, so the even places of all of them together are the words
+    flat = [x for song_words in words for x in song_words]
+    flat[0::2] = [string_id(w) for w in flat[0::2]]
+    pairs = array("I", flat)
+    word_starts = array("I", accumulate((len(w) // 2 for w in words), initial=0))
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for text in ids:
+        blob += text.encode("utf-8")
+        offsets.append(len(blob))
+
+    tmp = snapshot_path(filename) + ".tmp"
+    with open(tmp, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, sys.byteorder == "little", len(liked), len(ids),
+                                len(pairs) // 2, *_stamp(filename)))
+        # Every 4-byte section first, so each one stays aligned for memoryview.cast()
+        for part in (offsets, *columns, *numbers, word_starts, pairs):
+            part.tofile(file)
+        file.write(liked)
+        file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, snapshot_path(filename))
+
+def open_snapshot(filename, library=None):
+    """The SongSnapshot for songs.txt, or None when there is none or songs.txt changed since."""
+    try:
+        snapshot = SongSnapshot(snapshot_path(filename), library)
+        if snapshot.stamp == _stamp(filename): return snapshot
+    except FileNotFoundError: pass
+    except (OSError, ValueError, struct.error) as e: print(f"Ignoring bad snapshot: {e}")
+    return None
+
+class SongSnapshot:
+    """
+    A memory-mapped library snapshot. Acts as a read-only list of Songs (len, indexing,
+    slices) in the order it was written, but a Song is only built, and a string only
+    decoded, the first time someone asks for it. Songs get .library set, so changes
+    made to them before the library has loaded them are still reported.
+    """
+    def __init__(self, path, library=None):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, little, count, n_strings, n_pairs, size, mtime = _HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or little != (sys.byteorder == "little"):
+            raise ValueError("unknown snapshot format")
+        self.stamp = (size, mtime)
+        self.count = count
+        self.library = library
+
+        view, pos = memoryview(self.map), _HEADER.size
+        def section(fmt, length, size=4):
+            nonlocal pos
+            part = view[pos:pos + length * size].cast(fmt)
+            pos += length * size
+            return part
+        self.offsets = section("I", n_strings + 1)
+        for name in STRING_COLUMNS: setattr(self, name, section("I", count))
+        for name in NUMBER_COLUMNS: setattr(self, name, section("i", count))
+        self.word_starts = section("I", count + 1)
+        self.pairs = section("I", n_pairs * 2)
+        self.liked = section("B", count, 1)
+        self.blob = view[pos:pos + self.offsets[-1]]
+        if len(self.blob) != self.offsets[-1]: raise ValueError("snapshot is cut short")
+
+        self.strings = [None] * n_strings
+        self.songs = [None] * count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0: i += self.count
+        if not 0 <= i < self.count: raise IndexError(i)
+        song = self.songs[i]
+        if song is None:
+            s = self.string
+            song = self.songs[i] = Song(s(self.title[i]), s(self.artist[i]), s(self.album[i]), self.track_number[i],
+                                        self.duration[i], s(self.genre[i]), s(self.folder[i]) + s(self.file_name[i]),
+                                        s(self.image_path[i]), bool(self.liked[i]), self.play_count[i])
+            song.library = self.library
+        return song
+
+    def string(self, i):
+        text = self.strings[i]
+        if text is None:
+            text = self.strings[i] = sys.intern(str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8"))
+        return text
+
+    def words(self, i):
+        """Song i's search words, flat like MusicLibrary.song_words()."""
+        words = self.pairs[self.word_starts[i] * 2:self.word_starts[i + 1] * 2].tolist()
+        words[0::2] = [self.string(w) for w in words[0::2]]
+        return tuple(words)
+
+    def rows(self):
+        """Yields (fraction done, (Song, words)) for MusicLibrary.add_songs(), like player.read_songs_file()."""
+        for i in range(self.count):
+            yield (i + 1) / self.count, (self[i], self.words(i))
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+ELLIPSIS = "..."
+
+class TextFitter:
+    """
+    Shortens text with "..." so it fits a pixel width.
+    Binary searches the prefix length (a handful of font.measure calls instead of one
+    per character) and remembers results per (text, font, width) and per measured string,
+    so re-fitting the same labels while a panel is being resized is mostly cache hits.
+    """
+    def __init__(self, max_entries=8192):
+        self.max_entries = max_entries
+        self.fits = OrderedDict()     # (text, font, width) -> fitted text
+        self.widths = OrderedDict()   # (font, text) -> pixel width
+
+    def measure(self, font, text):
+        key = (font.name, text)
+        w = self.widths.get(key)
+        if w is None:
+            w = font.measure(text)
+            self._remember(self.widths, key, w)
+        return w
+
+    def fit(self, text, font, width):
+        if not text: return text
+        key = (text, font.name, width)
+        fitted = self.fits.get(key)
+        if fitted is not None:
+            self.fits.move_to_end(key)
+            return fitted
+
+        if self.measure(font, text) <= width:
+            fitted = text
+        elif self.measure(font, ELLIPSIS) > width:
+            fitted = "" # No room even for the ellipsis (e.g. a column before the first layout)
+        else:
+            # Longest prefix that still fits together with the ellipsis
+            lo, hi = 0, len(text) - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if self.measure(font, text[:mid] + ELLIPSIS) <= width: lo = mid
+                else: hi = mid - 1
+            fitted = text[:lo] + ELLIPSIS
+        self._remember(self.fits, key, fitted)
+        return fitted
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.max_entries: cache.popitem(last=False)
+
+text_fitter = TextFitter()
@@ -0,0 +1,101 @@
+import os
+import hashlib
+import threading
+from PIL import Image
+
+# Thumbnails live next to songs.txt, like the rest of the app's data
+THUMB_DIR = os.path.join(".cache", "thumbs")
+MAX_THUMB_BYTES = 64 * 1024 * 1024
+
+# Every size the UI asks for: list rows, mini player, album grid (all rounded with radius 10)
+THUMB_VARIANTS = [((48, 48), 10), ((100, 100), 10), ((160, 160), 10)]
+
+class ThumbnailStore:
+    """
+    On-disk cache of pre-resized, pre-masked album art (small PNGs).
+    The file name is a hash of (path, size, radius, source mtime, source size),
+    so an edited cover simply misses and the stale file ages out through eviction.
+    """
+    def __init__(self, folder=THUMB_DIR, max_bytes=MAX_THUMB_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.total_bytes = None # Unknown until the first scan
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def _thumb_path(self, image_path, size, radius):
+        try: st = os.stat(image_path)
+        except (OSError, TypeError): return None
+        raw = f"{os.path.abspath(image_path)}|{size[0]}x{size[1]}|{radius}|{st.st_mtime_ns}|{st.st_size}"
+        return os.path.join(self.folder, hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".png")
+
+    def load(self, image_path, size, radius=0):
+        """Returns the cached thumbnail as an RGBA Image, or None if it's missing/stale."""
+        path = self._thumb_path(image_path, size, radius)
+        if not path or not os.path.exists(path): return None
+        try:
+            with Image.open(path) as img:
+                img.load()
+                thumb = img.convert("RGBA") if img.mode != "RGBA" else img.copy()
+            os.utime(path) # Mark as recently used for eviction
+            return thumb
+        except Exception as e:
+            print(f"Bad thumbnail {path}: {e}")
+            return None
+
+    def save(self, image_path, size, radius, img):
+        path = self._thumb_path(image_path, size, radius)
+        if not path: return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            # Write to a temp file first so a crash never leaves half a PNG behind
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            img.save(tmp, "PNG", optimize=False)
+            os.replace(tmp, path)
+            with self.lock:
+                if self.total_bytes is not None: self.total_bytes += os.path.getsize(path)
+            self._enforce_cap()
+        except Exception as e:
+            print(f"Error saving thumbnail: {e}")
+
+    def _scan(self):
+        try: entries = [e for e in os.scandir(self.folder) if e.name.endswith(".png")]
+        except FileNotFoundError: return []
+        return [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+
+    def _enforce_cap(self):
+        with self.lock:
+            if self.total_bytes is not None and self.total_bytes <= self.max_bytes: return
+            files = self._scan()
+            self.total_bytes = sum(f[1] for f in files)
+            if self.total_bytes <= self.max_bytes: return
+            # Least recently used first, trim down to 90% so we don't evict on every save
+            files.sort()
+            target = self.max_bytes * 0.9
+            for _, nbytes, path in files:
+                if self.total_bytes <= target: break
+                try:
+                    os.remove(path)
+                    self.total_bytes -= nbytes
+                except OSError: pass
+
+    def warm(self, image_paths, render, variants=THUMB_VARIANTS):
+        """
+        Builds every missing thumbnail in a background thread.
+        render(path, size, radius) must return the finished RGBA Image.
+        """
+        if self.worker and self.worker.is_alive(): return
+        jobs = [(p, size, radius) for p in dict.fromkeys(image_paths) if p for size, radius in variants]
+
+        def run():
+            self._enforce_cap()
+            for p, size, radius in jobs:
+                path = self._thumb_path(p, size, radius)
+                if path and not os.path.exists(path):
+                    try: self.save(p, size, radius, render(p, size, radius))
+                    except Exception as e: print(f"Thumbnail error for {p}: {e}")
+
+        self.worker = threading.Thread(target=run, daemon=True)
+        self.worker.start()
+
+thumb_store = ThumbnailStore()